@@ -1,5 +1,4 @@
 import streamlit as st
-import json
 import os
 from typing import List, Dict, Any
 import sys
@@ -8,6 +7,9 @@ import sys
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'scripts'))
 
 from react_agent import ReActAgent, AgentConfig
+from llm_interface import warmup_model
+from llm_batching import BatchedLLM
+from run_index import get_run_index
 
 # Page config
 st.set_page_config(
@@ -49,28 +51,40 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
+@st.cache_resource(show_spinner="Loading model...")
+def load_model():
+    """Load and warm up the LLM once per process; every session and rerun reuses it."""
+    return warmup_model()
+
+
+load_model()
+
 # Initialize session state
 if 'chat_history' not in st.session_state:
     st.session_state.chat_history = []
 
 
-def load_previous_chats() -> List[Dict[str, Any]]:
-    """Load previous chats from JSON files."""
-    chats_dir = os.path.join(os.path.dirname(__file__), 'data', 'agent_runs')
-    if not os.path.exists(chats_dir):
-        return []
-    
-    chats = []
-    for filename in sorted(os.listdir(chats_dir), reverse=True):
-        if filename.endswith('.json'):
-            filepath = os.path.join(chats_dir, filename)
-            try:
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    chats.append(json.load(f))
-            except Exception as e:
-                st.warning(f"Could not load {filename}: {e}")
-    
-    return chats
+if 'chat_page' not in st.session_state:
+    st.session_state.chat_page = 0
+
+CHATS_PAGE_SIZE = 25
+
+
+@st.cache_resource
+def load_run_index():
+    """Open the run index once per process."""
+    return get_run_index()
+
+
+def load_previous_chats(page: int) -> List[Dict[str, Any]]:
+    """One page of previous chats (query + answer only) from the run index, newest first.
+
+    Runs saved since the last render (by other processes, or legacy JSON
+    files) are imported first; only the unread tail of each log is parsed.
+    """
+    index = load_run_index()
+    index.import_runs()
+    return index.page(page, CHATS_PAGE_SIZE)
 
 
 # Main UI
@@ -79,7 +93,8 @@ st.markdown('<div class="main-header">Tech Trends News Agent</div>', unsafe_allo
 # Sidebar for previous chats
 with st.sidebar:
     st.header("Previous Chats")
-    previous_chats = load_previous_chats()
+    previous_chats = load_previous_chats(st.session_state.chat_page)
+    total_pages = max(1, -(-load_run_index().count() // CHATS_PAGE_SIZE))
     
     if previous_chats:
         chat_options = [f"{chat['query'][:50]}..." if len(chat['query']) > 50 else chat['query'] 
@@ -95,9 +110,21 @@ with st.sidebar:
             selected_chat = previous_chats[selected_chat_idx]
             st.session_state.chat_history = [
                 {'role': 'user', 'content': selected_chat['query']},
-                {'role': 'assistant', 'content': selected_chat['result'].get('answer', 'No answer available.')}
+                {'role': 'assistant', 'content': selected_chat['answer'] or 'No answer available.'}
             ]
             st.rerun()
+        
+        prev_col, page_col, next_col = st.columns([1, 2, 1])
+        with prev_col:
+            if st.button("‹", disabled=st.session_state.chat_page == 0):
+                st.session_state.chat_page -= 1
+                st.rerun()
+        with page_col:
+            st.caption(f"Page {st.session_state.chat_page + 1} of {total_pages}")
+        with next_col:
+            if st.button("›", disabled=st.session_state.chat_page + 1 >= total_pages):
+                st.session_state.chat_page += 1
+                st.rerun()
     else:
         st.info("No previous chats found.")
 
@@ -126,12 +153,29 @@ if send_button and query:
     # Add user message to chat
     st.session_state.chat_history.append({'role': 'user', 'content': query})
     
-    with st.spinner("Thinking..."):
+    with st.chat_message("assistant"):
+        status_box = st.empty()
+        answer_box = st.empty()
+        status_box.caption("Thinking...")
         try:
-            # Run agent
+            # Run agent, rendering its events as they arrive
             config = AgentConfig(max_steps=6, allow_tools=("search", "finish"), verbose=False)
-            agent = ReActAgent(config=config)
-            result = agent.run(query)
+            # Sessions run in their own threads; BatchedLLM batches their generate calls together.
+            agent = ReActAgent(llm=BatchedLLM(), config=config)
+            result, step_text, answer = {}, "", ""
+            for event in agent.run_stream(query):
+                if event["type"] == "step":
+                    step_text = ""
+                elif event["type"] == "token" and not answer:
+                    step_text += event["text"]
+                    status_box.caption(step_text)
+                elif event["type"] == "observation" and "results" in event:
+                    status_box.caption(f"Searched \"{event['query']}\": {len(event['results'])} articles")
+                elif event["type"] == "answer_token":
+                    answer += event["text"]
+                    answer_box.write(answer)
+                elif event["type"] == "final":
+                    result = event["result"]
             
             # Get answer
             answer = result.get('answer', 'No answer provided.')
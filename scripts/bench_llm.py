@@ -0,0 +1,160 @@
+import os
+import time
+import resource
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import torch
+
+from llm_interface import MODEL_NAME, DTYPE, LLM_BACKENDS, get_model, warmup_model
+from llm_batching import BatchedLLM
+from llm_cache import CompletionCache
+from run_log import iter_runs
+
+QUESTIONS = [
+    "What are the latest technology trends?",
+    "What is new in AI chips this month?",
+    "How are companies using generative AI?",
+    "What happened with quantum computing recently?",
+    "Which startups raised funding for robotics?",
+    "What are the main cybersecurity threats right now?",
+    "How is the smartphone market changing?",
+    "What is the state of electric vehicle batteries?",
+]
+
+
+def make_prompts(n: int):
+    from react_agent import make_prompt
+    return [make_prompt(QUESTIONS[i % len(QUESTIONS)], []) for i in range(n)]
+
+
+# ----------------------------
+# Throughput vs. batch size
+# ----------------------------
+def bench_batching(model_name: str, prompts, batch_sizes, max_new_tokens: int):
+    print(f"{len(prompts)} concurrent prompts, {max_new_tokens} max new tokens, greedy")
+    print(f"{'max batch':>10}{'seconds':>10}{'avg batch':>11}{'tokens':>8}{'tokens/s':>10}")
+    for max_batch in batch_sizes:
+        llm = BatchedLLM(model_name=model_name, max_new_tokens=max_new_tokens, max_batch=max_batch,
+                         generation_kwargs={"do_sample": False})
+        scheduler = llm.scheduler
+        before = scheduler.stats()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(prompts)) as pool:
+            list(pool.map(llm, prompts))
+        elapsed = time.perf_counter() - start
+        after = scheduler.stats()
+        batches = after["batches"] - before["batches"]
+        tokens = after["generated_tokens"] - before["generated_tokens"]
+        print(f"{max_batch:>10}{elapsed:>10.2f}{len(prompts) / batches:>11.1f}{tokens:>8}{tokens / elapsed:>10.1f}")
+
+
+# ----------------------------
+# Backends: speed, memory, agreement with fp32
+# ----------------------------
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def greedy_tokens(handle, prompt: str, max_new_tokens: int):
+    inputs = handle.tokenizer(prompt, return_tensors="pt").to(handle.model.device)
+    output = handle.generate(**inputs, max_new_tokens=max_new_tokens, do_sample=False)
+    return output[0][inputs["input_ids"].shape[1]:].tolist()
+
+
+def common_prefix(a, b) -> int:
+    n = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        n += 1
+    return n
+
+
+def bench_backends(model_name: str, prompts, backends, max_new_tokens: int):
+    print(f"{len(prompts)} prompts one at a time, {max_new_tokens} max new tokens, greedy; "
+          f"agreement is against the first backend")
+    print(f"{'backend':>8}{'load MB':>9}{'seconds':>9}{'tokens/s':>10}{'exact':>7}{'agree':>7}")
+    baseline = None
+    for backend in backends:
+        before = rss_mb()
+        try:
+            handle = get_model(model_name, torch.float32 if backend == "torch" else DTYPE, backend)
+        except ImportError as e:
+            print(f"{backend:>8}  skipped: {e}")
+            continue
+        loaded_mb = rss_mb() - before
+        greedy_tokens(handle, prompts[0], 4)  # warm-up
+        start = time.perf_counter()
+        outputs = [greedy_tokens(handle, p, max_new_tokens) for p in prompts]
+        elapsed = time.perf_counter() - start
+        tokens = sum(len(o) for o in outputs)
+        if baseline is None:
+            baseline = outputs
+        exact = sum(o == b for o, b in zip(outputs, baseline)) / len(prompts)
+        agree = sum(common_prefix(o, b) for o, b in zip(outputs, baseline)) / max(1, sum(len(b) for b in baseline))
+        print(f"{backend:>8}{loaded_mb:>9.0f}{elapsed:>9.2f}{tokens / elapsed:>10.1f}{exact:>7.0%}{agree:>7.0%}")
+
+
+# ----------------------------
+# Replaying saved runs through the completion cache
+# ----------------------------
+def saved_queries(n: int):
+    return [run["query"] for run, _ in zip(iter_runs(), range(n))]
+
+
+def bench_replay(model_name: str, queries, max_new_tokens: int):
+    from react_agent import ReActAgent, AgentConfig
+    from llm_interface import HF_LLM
+
+    class ReplayAgent(ReActAgent):
+        def save_run(self, user_query, result):
+            pass  # don't add benchmark runs to the saved history
+
+    print(f"Replaying {len(queries)} saved queries in deterministic mode")
+    print(f"{'pass':<8}{'seconds':>10}{'hits':>6}{'misses':>8}  answers")
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = CompletionCache(os.path.join(tmp, "llm_cache.sqlite"))
+        llm = HF_LLM(model_name=model_name, max_new_tokens=max_new_tokens, deterministic=True, cache=cache)
+        agent = ReplayAgent(llm=llm, config=AgentConfig(verbose=False, deterministic=True))
+        previous = None
+        for name in ("cold", "warm"):
+            hits, misses = cache.hits, cache.misses
+            start = time.perf_counter()
+            answers = [agent.run(q)["answer"] for q in queries]
+            elapsed = time.perf_counter() - start
+            same = "" if previous is None else ("identical" if answers == previous else "DIFFER")
+            print(f"{name:<8}{elapsed:>10.2f}{cache.hits - hits:>6}{cache.misses - misses:>8}  {same}")
+            previous = answers
+        cache.close()
+
+
+# ----------------------------
+# Main execution
+# ----------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark LLM generation throughput.")
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--prompts", type=int, default=8, help="concurrent callers")
+    parser.add_argument("--batch-sizes", type=int, nargs="*", default=[1, 2, 4, 8])
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    parser.add_argument("--backends", nargs="*", default=["torch", "int8"], choices=LLM_BACKENDS,
+                        help="first one is the agreement baseline")
+    parser.add_argument("--replay", type=int, default=0, help="replay this many saved runs twice")
+    args = parser.parse_args()
+
+    prompts = make_prompts(args.prompts)
+    if args.backends:
+        bench_backends(args.model, prompts, args.backends, args.max_new_tokens)
+        print()
+    if args.batch_sizes:
+        warmup_model(args.model)
+        bench_batching(args.model, prompts, args.batch_sizes, args.max_new_tokens)
+    if args.replay:
+        print()
+        bench_replay(args.model, saved_queries(args.replay), args.max_new_tokens)
@@ -0,0 +1,67 @@
+import os
+import glob
+import json
+import time
+import argparse
+from typing import List
+
+import preprocess_articles
+from preprocess_articles import preprocess_texts, clean_text, lemmatize, lemma_cache_stats, PREPROCESS_CHUNK
+
+RAW_DIR = os.path.join(os.path.dirname(__file__), "..", "data", "raw")
+
+
+# ----------------------------
+# Documents from the raw NewsAPI dumps
+# ----------------------------
+def raw_texts(raw_dir: str = RAW_DIR) -> List[str]:
+    """Title, description and content of every article in ``raw_dir``."""
+    texts = []
+    for path in sorted(glob.glob(os.path.join(raw_dir, "*.json"))):
+        with open(path, "r", encoding="utf-8") as f:
+            for art in json.load(f):
+                texts.append(" ".join(art.get(k) or "" for k in ("title", "description", "content")))
+    return texts
+
+
+# ----------------------------
+# Main execution
+# ----------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark article preprocessing throughput.")
+    parser.add_argument("--raw-dir", default=RAW_DIR)
+    parser.add_argument("--repeat", type=int, default=20, help="times to repeat the raw documents")
+    parser.add_argument("--workers", type=int, nargs="*", default=[1, 2, 4])
+    parser.add_argument("--chunk-size", type=int, default=PREPROCESS_CHUNK)
+    args = parser.parse_args()
+
+    texts = raw_texts(args.raw_dir) * args.repeat
+    if not texts:
+        raise SystemExit(f"No raw articles found in {args.raw_dir}")
+    reference = [clean_text(t) for t in texts[:200]]
+
+    print(f"{len(texts)} documents ({len(texts) // args.repeat} raw x {args.repeat}), "
+          f"chunks of {args.chunk_size}, {os.cpu_count()} CPUs")
+    # Baseline: WordNet called for every token occurrence, as before the lemma cache.
+    start = time.perf_counter()
+    for t in texts:
+        [preprocess_articles.lemmatizer.lemmatize(tok) for tok in preprocess_articles._filter_tokens(t)]
+    uncached = time.perf_counter() - start
+    print(f"uncached lemmatizer, 1 worker: {uncached:.2f}s, {len(texts) / uncached:.1f} docs/s")
+
+    print(f"{'workers':>8}{'seconds':>10}{'docs/s':>10}{'tokens':>10}{'lemmatized':>12}{'hit rate':>10}"
+          f"{'table':>7}{'same':>7}")
+    for workers in args.workers:
+        lemmatize.cache_clear()  # every run starts cold
+        before = lemma_cache_stats()
+        lemmas = {}
+        start = time.perf_counter()
+        results = list(preprocess_texts(texts, workers=workers, chunk_size=args.chunk_size, lemmas=lemmas))
+        elapsed = time.perf_counter() - start
+        after = lemma_cache_stats()
+        hits, misses = after["hits"] - before["hits"], after["misses"] - before["misses"]
+        tokens = sum(len(r) for r in results)
+        same = results[:len(reference)] == reference
+        # "lemmatized" counts actual WordNet lookups (cache misses), summed over workers
+        print(f"{workers:>8}{elapsed:>10.2f}{len(texts) / elapsed:>10.1f}{tokens:>10}{misses:>12}"
+              f"{hits / max(1, hits + misses):>10.1%}{len(lemmas):>7}{str(same):>7}")
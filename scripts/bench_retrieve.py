@@ -0,0 +1,190 @@
+import gzip
+import time
+import hashlib
+import tempfile
+import argparse
+import threading
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import List
+
+import requests
+
+from retrieve_articles import fetch_article_texts
+from http_client import create_session
+from http_cache import HTTPCache
+
+# ----------------------------
+# Local stand-in for publisher sites
+# ----------------------------
+class StandInServer:
+    """Serves canned article pages on localhost with artificial latency.
+
+    Each instance listens on its own port, so several instances look like
+    several publisher hosts to the fetcher. Tracks request counts, accepted
+    TCP connections, response bytes, 304s and the peak number of requests in
+    flight. Bodies are gzipped when the client asks for it, and pages carry an
+    ETag so conditional GETs can be answered with 304 Not Modified.
+    """
+
+    def __init__(self, latency: float = 0.2, paragraphs: int = 20):
+        self.latency = latency
+        self.paragraphs = paragraphs
+        self.requests = 0
+        self.connections = 0
+        self.bytes_sent = 0
+        self.not_modified = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def page(self, path: str) -> bytes:
+        body = "".join(f"<p>Canned article {path} paragraph {i}.</p>" for i in range(self.paragraphs))
+        return f"<html><body><h1>{path}</h1>{body}</body></html>".encode("utf-8")
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True  # headers and body go out as separate writes
+
+            def setup(self):
+                super().setup()
+                with server._lock:
+                    server.connections += 1
+
+            def do_GET(self):
+                with server._lock:
+                    server.requests += 1
+                    server.in_flight += 1
+                    server.peak_in_flight = max(server.peak_in_flight, server.in_flight)
+                try:
+                    time.sleep(server.latency)
+                    body = server.page(self.path)
+                    etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+                    if self.headers.get("If-None-Match") == etag:
+                        with server._lock:
+                            server.not_modified += 1
+                        self.send_response(304)
+                        self.send_header("ETag", etag)
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    self.send_response(200)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Type", "text/html; charset=utf-8")
+                    if "gzip" in self.headers.get("Accept-Encoding", ""):
+                        body = gzip.compress(body)
+                        self.send_header("Content-Encoding", "gzip")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    with server._lock:
+                        server.bytes_sent += len(body)
+                finally:
+                    with server._lock:
+                        server.in_flight -= 1
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def reset_counters(self):
+        with self._lock:
+            self.requests = self.connections = self.bytes_sent = self.peak_in_flight = 0
+            self.not_modified = 0
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def article_urls(servers: List[StandInServer], n: int) -> List[str]:
+    # Skewed towards the first host, like a batch dominated by one publisher.
+    hosts = [servers[0]] * (len(servers) + 1) + servers[1:]
+    return [f"{hosts[i % len(hosts)].base_url}/story/{i}" for i in range(n)]
+
+
+# ----------------------------
+# Main execution
+# ----------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark full-text fetching against local stand-in hosts.")
+    parser.add_argument("--articles", type=int, default=60)
+    parser.add_argument("--hosts", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per response")
+    parser.add_argument("--workers", type=int, nargs="*", default=[1, 4, 16])
+    parser.add_argument("--per-host", type=int, default=4)
+    args = parser.parse_args()
+
+    servers = [StandInServer(latency=args.latency) for _ in range(args.hosts)]
+    for s in servers:
+        s.__enter__()
+    try:
+        urls = article_urls(servers, args.articles)
+        print(f"{args.articles} articles over {args.hosts} hosts, {args.latency * 1000:.0f} ms latency")
+        print(f"{'workers':>8}{'per host':>10}{'seconds':>10}{'in order':>10}{'peak/host':>11}")
+        for workers in args.workers:
+            for s in servers:
+                s.reset_counters()
+            per_host = 1 if workers == 1 else args.per_host
+            start = time.perf_counter()
+            texts = fetch_article_texts(urls, workers=workers, per_host=per_host, deadline=None)
+            elapsed = time.perf_counter() - start
+            in_order = all(f"/story/{i} " in t for i, t in enumerate(texts))
+            peak = max(s.peak_in_flight for s in servers)
+            print(f"{workers:>8}{per_host:>10}{elapsed:>10.2f}{str(in_order):>10}{peak:>11}")
+
+        start = time.perf_counter()
+        texts = fetch_article_texts(urls, workers=4, per_host=2, deadline=args.latency * 3)
+        print(f"\nDeadline {args.latency * 3:.2f}s: returned after {time.perf_counter() - start:.2f}s "
+              f"with {sum(1 for t in texts if t)}/{len(texts)} texts, "
+              f"hosts served: {dict(Counter(u.rsplit('/story', 1)[0] for u, t in zip(urls, texts) if t))}")
+
+        print(f"\nConnection reuse ({args.per_host * args.hosts} workers, {args.per_host} per host)")
+        print(f"{'client':<24}{'seconds':>10}{'requests':>10}{'connections':>13}{'KB sent':>10}")
+        clients = {
+            "bare requests.get": requests,
+            "pooled session": create_session(pool_maxsize=args.per_host),
+        }
+        for name, session in clients.items():
+            for s in servers:
+                s.reset_counters()
+            start = time.perf_counter()
+            fetch_article_texts(urls, workers=args.per_host * args.hosts, per_host=args.per_host,
+                                deadline=None, session=session)
+            elapsed = time.perf_counter() - start
+            print(f"{name:<24}{elapsed:>10.2f}{sum(s.requests for s in servers):>10}"
+                  f"{sum(s.connections for s in servers):>13}{sum(s.bytes_sent for s in servers) / 1024:>10.1f}")
+
+        print(f"\nHTTP cache revalidation ({args.per_host * args.hosts} workers)")
+        print(f"{'run':<24}{'seconds':>10}{'requests':>10}{'304s':>8}{'KB sent':>10}")
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = HTTPCache(cache_dir)
+            for name in ("cold cache", "warm cache"):
+                for s in servers:
+                    s.reset_counters()
+                start = time.perf_counter()
+                texts = fetch_article_texts(urls, workers=args.per_host * args.hosts, per_host=args.per_host,
+                                            deadline=None, cache=cache)
+                elapsed = time.perf_counter() - start
+                assert all(f"/story/{i} " in t for i, t in enumerate(texts))
+                print(f"{name:<24}{elapsed:>10.2f}{sum(s.requests for s in servers):>10}"
+                      f"{sum(s.not_modified for s in servers):>8}{sum(s.bytes_sent for s in servers) / 1024:>10.1f}")
+            print(f"cache stats: {cache.stats()}")
+    finally:
+        for s in servers:
+            s.__exit__(None, None, None)
@@ -0,0 +1,133 @@
+import os
+import math
+import glob
+import time
+import random
+import argparse
+from typing import List, Dict, Any
+
+from search_articles import tokenize, compute_df, tfidf_vector, cosine, search_corpus
+from search_index import InvertedIndex, SCORERS
+from corpus_store import CORPUS_SUFFIX, read_corpus
+
+try:
+    from sparse_search import SparseIndex
+except ImportError:
+    SparseIndex = None
+
+# ----------------------------
+# Benchmark queries
+# ----------------------------
+QUERIES = [
+    "latest technology trends",
+    "current trends in AI",
+    "artificial intelligence chip nvidia",
+    "cancer treatment light",
+    "electric vehicle battery",
+    "apple iphone release",
+    "cybersecurity data breach",
+    "climate change energy",
+    "social media regulation",
+    "quantum computing research",
+]
+
+
+# ----------------------------
+# Reference: the original per-query full-corpus cosine loop
+# ----------------------------
+def legacy_search(query: str, corpus: List[Dict[str, Any]], k: int = 5):
+    docs = [{"id": d["id"], "tokens": d.get("tokens", [])} for d in corpus]
+    doc_tokens = [d["tokens"] for d in docs]
+    df = compute_df(doc_tokens)
+    n_docs = len(doc_tokens)
+    idf = {t: math.log((n_docs + 1) / (df[t] + 0.5)) + 1 for t in df}
+    doc_vecs = [tfidf_vector(d["tokens"], idf) for d in docs]
+    q_vec = tfidf_vector(tokenize(query), idf)
+    scored = [(cosine(q_vec, v), i) for i, v in enumerate(doc_vecs)]
+    scored.sort(reverse=True)
+    return [docs[i]["id"] for score, i in scored[:k] if score > 0]
+
+
+def time_per_query(fn, queries: List[str], repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for q in queries:
+            fn(q)
+    return (time.perf_counter() - start) / (repeat * len(queries)) * 1000
+
+
+def scale_corpus(corpus: List[Dict[str, Any]], factor: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """Grow the corpus synthetically: each copy keeps a random 80% of every document's tokens."""
+    rng = random.Random(seed)
+    scaled = list(corpus)
+    for copy in range(1, factor):
+        for d in corpus:
+            tokens = [t for t in d.get("tokens", []) if rng.random() < 0.8]
+            scaled.append({"id": f"{d['id']}_copy{copy}", "tokens": tokens})
+    return scaled
+
+
+def overlap(a: List[str], b: List[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(set(a) & set(b)) / max(len(a), len(b))
+
+
+# ----------------------------
+# Main execution
+# ----------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare search scorers on the processed corpus.")
+    parser.add_argument("--processed-dir", default="../data/processed")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--scale", type=int, nargs="*", default=[1, 10, 100],
+                        help="corpus growth factors for the MaxScore pruning comparison")
+    args = parser.parse_args()
+
+    paths = (glob.glob(os.path.join(args.processed_dir, "technology_*.json"))
+             + glob.glob(os.path.join(args.processed_dir, f"technology_*{CORPUS_SUFFIX}")))
+    for path in sorted(paths):
+        corpus = list(read_corpus(path))
+        index = InvertedIndex.build(corpus)
+        backends = {"postings": index}
+        if SparseIndex is not None:
+            try:
+                backends["sparse"] = SparseIndex(index)
+            except ImportError as e:
+                print(f"Skipping sparse backend: {e}")
+        print(f"\n{os.path.basename(path)}: {len(corpus)} docs, {len(index.postings)} terms, k={args.k}")
+
+        legacy_ms = time_per_query(lambda q: legacy_search(q, corpus, args.k), QUERIES, 1)
+        print(f"{'scorer':<24}{'ms/query':>10}{'speedup':>10}{'overlap@k':>12}")
+        print(f"{'legacy cosine':<24}{legacy_ms:>10.3f}{1.0:>10.1f}{1.0:>12.2f}")
+
+        baseline = {q: legacy_search(q, corpus, args.k) for q in QUERIES}
+        for name, backend in backends.items():
+            for scorer in SCORERS:
+                ms = time_per_query(lambda q: search_corpus(q, backend, args.k, scorer=scorer),
+                                    QUERIES, args.repeat)
+                ov = sum(overlap(baseline[q], [r["id"] for r in search_corpus(q, backend, args.k, scorer=scorer)])
+                         for q in QUERIES) / len(QUERIES)
+                label = f"{scorer} ({name})"
+                print(f"{label:<24}{ms:>10.3f}{legacy_ms / ms:>10.1f}{ov:>12.2f}")
+
+        if "sparse" in backends:
+            batch = [tokenize(q) for q in QUERIES]
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                backends["sparse"].search_batch(batch, args.k)
+            ms = (time.perf_counter() - start) / (args.repeat * len(QUERIES)) * 1000
+            label = "cosine (sparse batch)"
+            print(f"{label:<24}{ms:>10.3f}{legacy_ms / ms:>10.1f}{'-':>12}")
+
+        print(f"\nMaxScore pruning vs exhaustive term-at-a-time (k={args.k})")
+        print(f"{'docs':>8}  {'scorer':<8}{'exhaustive ms':>15}{'pruned ms':>12}{'speedup':>10}")
+        q_tokens = [tokenize(q) for q in QUERIES]
+        for factor in args.scale:
+            scaled = InvertedIndex.build(scale_corpus(corpus, factor))
+            repeat = max(1, args.repeat // factor)
+            for scorer in SCORERS:
+                full_ms = time_per_query(lambda q: scaled.search(q, args.k, scorer, prune=False), q_tokens, repeat)
+                pruned_ms = time_per_query(lambda q: scaled.search(q, args.k, scorer), q_tokens, repeat)
+                print(f"{len(scaled):>8}  {scorer:<8}{full_ms:>15.3f}{pruned_ms:>12.3f}{full_ms / pruned_ms:>10.1f}")
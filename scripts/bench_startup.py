@@ -0,0 +1,72 @@
+import os
+import sys
+import time
+import argparse
+import subprocess
+from typing import Dict, List, Tuple
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(SCRIPTS_DIR)
+
+# module -> directory it is run from
+ENTRY_POINTS = {
+    "react_agent": SCRIPTS_DIR,
+    "retrieve_articles": SCRIPTS_DIR,
+    "search_articles": SCRIPTS_DIR,
+    "preprocess_articles": SCRIPTS_DIR,
+    "app": ROOT_DIR,  # needs streamlit installed
+}
+HEAVY_MODULES = ("torch", "transformers", "nltk")
+
+
+# ----------------------------
+# One cold import under -X importtime
+# ----------------------------
+def profile_import(module: str, cwd: str) -> Dict:
+    """Import ``module`` in a fresh interpreter; returns wall time, -X importtime rows and heavy modules loaded."""
+    code = f"import sys, {module}; print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=cwd,
+                          capture_output=True, text=True)
+    wall = time.perf_counter() - start
+
+    rows: List[Tuple[int, str]] = []  # (cumulative microseconds, module)
+    errors = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            errors.append(line)
+            continue
+        parts = line[len("import time:"):].split("|")
+        if parts[0].strip().isdigit():  # skip the header row
+            rows.append((int(parts[1]), parts[2].rstrip()))
+    total = next((us for us, name in rows if name.strip() == module), None)
+    return {
+        "ok": proc.returncode == 0,
+        "wall": wall,
+        "import_ms": total / 1000 if total is not None else None,
+        "heavy": proc.stdout.split() if proc.returncode == 0 else [],
+        "top": sorted(rows, reverse=True),
+        "error": errors[-1] if errors else "",
+    }
+
+
+# ----------------------------
+# Main execution
+# ----------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark cold import time of each entry point.")
+    parser.add_argument("modules", nargs="*", default=list(ENTRY_POINTS), help="entry points to import")
+    parser.add_argument("--runs", type=int, default=3, help="fresh interpreters per entry point (best is shown)")
+    parser.add_argument("--top", type=int, default=0, help="also list the N slowest imports of each entry point")
+    args = parser.parse_args()
+
+    print(f"{'entry point':<22}{'wall s':>8}{'import ms':>11}  heavy modules loaded")
+    for module in args.modules:
+        runs = [profile_import(module, ENTRY_POINTS.get(module, SCRIPTS_DIR)) for _ in range(args.runs)]
+        best = min(runs, key=lambda r: r["wall"])
+        if not best["ok"]:
+            print(f"{module:<22}  failed: {best['error']}")
+            continue
+        print(f"{module:<22}{best['wall']:>8.2f}{best['import_ms']:>11.1f}  {', '.join(best['heavy']) or '-'}")
+        for us, name in best["top"][:args.top]:
+            print(f"{'':<22}{us / 1000:>19.1f}  {name}")
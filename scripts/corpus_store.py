@@ -0,0 +1,305 @@
+import os
+import sys
+import json
+import mmap
+import time
+import shutil
+import hashlib
+import logging
+from array import array
+from collections.abc import Sequence
+from typing import List, Dict, Any, Iterable, Optional
+
+# ----------------------------
+# Binary corpus layout
+# ----------------------------
+# <name>.corpus/
+#   vocab.json    interned vocabulary, token id = list position
+#   tokens.u32    every document's token ids, concatenated (native uint32)
+#   offsets.u64   n_docs + 1 offsets into tokens.u32 (native uint64)
+#   meta.json     format info + per-document id/url/title table
+#   manifest.json url -> {id, hash} of every document, for incremental updates
+#   lemmas.json   token -> lemma for corpus tokens whose lemma differs, for query lemmatization
+CORPUS_SUFFIX = ".corpus"
+CORPUS_FORMAT = 1
+VOCAB_FILE = "vocab.json"
+TOKENS_FILE = "tokens.u32"
+OFFSETS_FILE = "offsets.u64"
+META_FILE = "meta.json"
+MANIFEST_FILE = "manifest.json"
+LEMMAS_FILE = "lemmas.json"
+META_FIELDS = ("id", "url", "title")
+
+
+CORPUS_EXTS = (CORPUS_SUFFIX, ".json")  # binary corpus preferred over JSON of the same name
+
+
+def latest_corpus_path(processed_dir: str) -> Optional[str]:
+    """Newest processed corpus in ``processed_dir`` (by timestamped name), or None."""
+    stems = {}
+    for f in os.listdir(processed_dir):
+        stem, ext = os.path.splitext(f)
+        if ext not in CORPUS_EXTS:
+            continue
+        if stem not in stems or CORPUS_EXTS.index(ext) < CORPUS_EXTS.index(stems[stem]):
+            stems[stem] = ext
+    if not stems:
+        return None
+    latest = max(stems)
+    return os.path.join(processed_dir, latest + stems[latest])
+
+
+def corpus_files(path: str) -> List[str]:
+    """Files whose contents make up a corpus (the JSON file itself, or the binary parts)."""
+    if os.path.isdir(path):
+        return [os.path.join(path, name) for name in (META_FILE, VOCAB_FILE, OFFSETS_FILE, TOKENS_FILE)]
+    return [path]
+
+
+# ----------------------------
+# Writer
+# ----------------------------
+def write_corpus(docs: Iterable[Dict[str, Any]], path: str) -> str:
+    """Write processed documents (dicts with id/url/title/tokens) as a binary corpus."""
+    vocab: Dict[str, int] = {}
+    tokens = array("I")
+    offsets = array("Q", [0])
+    meta = []
+    for d in docs:
+        for t in d.get("tokens", []):
+            tid = vocab.get(t)
+            if tid is None:
+                tid = vocab[t] = len(vocab)
+            tokens.append(tid)
+        offsets.append(len(tokens))
+        meta.append({field: d.get(field) for field in META_FIELDS})
+
+    tmp_path = path + ".tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    with open(os.path.join(tmp_path, VOCAB_FILE), "w", encoding="utf-8") as f:
+        json.dump(list(vocab), f, ensure_ascii=False, separators=(",", ":"))
+    with open(os.path.join(tmp_path, TOKENS_FILE), "wb") as f:
+        tokens.tofile(f)
+    with open(os.path.join(tmp_path, OFFSETS_FILE), "wb") as f:
+        offsets.tofile(f)
+    with open(os.path.join(tmp_path, META_FILE), "w", encoding="utf-8") as f:
+        json.dump({"format": CORPUS_FORMAT, "byteorder": sys.byteorder, "docs": meta},
+                  f, ensure_ascii=False, separators=(",", ":"))
+
+    _write_manifest(tmp_path, build_manifest(meta, _iter_token_lists(tokens, offsets, list(vocab))))
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+    logging.info(f"Wrote binary corpus {path}: {len(meta)} docs, {len(vocab)} terms, {len(tokens)} tokens")
+    return path
+
+
+# ----------------------------
+# Manifest + incremental append
+# ----------------------------
+def content_hash(tokens: List[str]) -> str:
+    """Hash of a document's processed tokens, used to spot re-published content."""
+    return hashlib.sha1(" ".join(tokens).encode("utf-8")).hexdigest()[:16]
+
+
+def _iter_token_lists(tokens, offsets, vocab):
+    for start, end in zip(offsets[:-1], offsets[1:]):
+        yield [vocab[t] for t in tokens[start:end]]
+
+
+def build_manifest(docs_meta, token_lists) -> Dict[str, Any]:
+    # Documents without tokens (full text not fetched) stay out, so incremental updates retry them.
+    articles = {}
+    for meta, tokens in zip(docs_meta, token_lists):
+        if meta.get("url") and tokens:
+            articles[meta["url"]] = {"id": meta["id"], "hash": content_hash(tokens)}
+    return {"updated_at": time.time(), "articles": articles}
+
+
+def _write_manifest(path: str, manifest: Dict[str, Any]):
+    tmp_path = os.path.join(path, MANIFEST_FILE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, os.path.join(path, MANIFEST_FILE))
+
+
+def load_manifest(path: str) -> Dict[str, Any]:
+    """URL/content-hash manifest of a binary corpus (rebuilt from the corpus if missing)."""
+    try:
+        with open(os.path.join(path, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        corpus = BinaryCorpus(path)
+        manifest = build_manifest(corpus.meta, (corpus.tokens(i) for i in range(len(corpus))))
+        manifest["updated_at"] = os.path.getmtime(os.path.join(path, META_FILE))
+        _write_manifest(path, manifest)
+        return manifest
+
+
+# ----------------------------
+# Lemma table
+# ----------------------------
+def write_lemmas(path: str, lemmas: Dict[str, str]) -> Dict[str, str]:
+    """Merge ``lemmas`` into the token -> lemma table of a binary corpus; returns the merged table."""
+    table = load_lemmas(path)
+    table.update(lemmas)
+    tmp_path = os.path.join(path, LEMMAS_FILE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(table, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, os.path.join(path, LEMMAS_FILE))
+    return table
+
+
+def load_lemmas(path: str) -> Dict[str, str]:
+    """Token -> lemma table saved with a corpus ({} for JSON corpora or corpora without one)."""
+    try:
+        with open(os.path.join(path, LEMMAS_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def append_corpus(path: str, docs: List[Dict[str, Any]]) -> int:
+    """Append documents to an existing binary corpus in place; returns the new doc count.
+
+    Token ids and offsets are appended to the end of their files and only the
+    (small) vocabulary, metadata and manifest are rewritten. meta.json is
+    replaced last, so readers never see a document whose tokens are missing.
+    """
+    with open(os.path.join(path, META_FILE), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    with open(os.path.join(path, VOCAB_FILE), "r", encoding="utf-8") as f:
+        vocab_list = json.load(f)
+    manifest = load_manifest(path)
+    vocab = {t: i for i, t in enumerate(vocab_list)}
+
+    # Continue from the offset of the last document meta.json knows about;
+    # anything past it was left behind by an interrupted append.
+    n_docs = len(meta["docs"])
+    offsets_path = os.path.join(path, OFFSETS_FILE)
+    with open(offsets_path, "rb") as f:
+        last = array("Q")
+        f.seek(n_docs * last.itemsize)
+        last.fromfile(f, 1)
+    end = last[0]
+
+    tokens = array("I")
+    offsets = array("Q")
+    for d in docs:
+        doc_tokens = d.get("tokens", [])
+        for t in doc_tokens:
+            tid = vocab.get(t)
+            if tid is None:
+                tid = vocab[t] = len(vocab_list)
+                vocab_list.append(t)
+            tokens.append(tid)
+        offsets.append(end + len(tokens))
+        meta["docs"].append({field: d.get(field) for field in META_FIELDS})
+        if d.get("url") and doc_tokens:
+            manifest["articles"][d["url"]] = {"id": d["id"], "hash": content_hash(doc_tokens)}
+
+    with open(os.path.join(path, TOKENS_FILE), "r+b") as f:
+        f.truncate(end * tokens.itemsize)
+        f.seek(0, os.SEEK_END)
+        tokens.tofile(f)
+    with open(offsets_path, "r+b") as f:
+        f.truncate((n_docs + 1) * offsets.itemsize)
+        f.seek(0, os.SEEK_END)
+        offsets.tofile(f)
+
+    for name, payload in ((VOCAB_FILE, vocab_list), (META_FILE, meta)):
+        tmp_path = os.path.join(path, name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, os.path.join(path, name))
+    manifest["updated_at"] = time.time()
+    _write_manifest(path, manifest)
+    logging.info(f"Appended {len(docs)} docs to {path}: now {len(meta['docs'])} docs, {len(vocab_list)} terms")
+    return len(meta["docs"])
+
+
+# ----------------------------
+# Reader
+# ----------------------------
+def _map_array(path: str, typecode: str):
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return memoryview(array(typecode))
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return memoryview(mm).cast(typecode)
+
+
+class BinaryCorpus(Sequence):
+    """Read-only, memory-mapped view of a binary corpus.
+
+    Token ids and offsets stay in the page cache (shared between processes
+    that open the same corpus); ``corpus[i]`` decodes a single document into
+    the same dict shape as the processed JSON.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, META_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("format") != CORPUS_FORMAT or meta.get("byteorder") != sys.byteorder:
+            raise ValueError(f"Unsupported binary corpus {path}: format {meta.get('format')}, "
+                             f"byteorder {meta.get('byteorder')}")
+        self.meta = meta["docs"]
+        with open(os.path.join(path, VOCAB_FILE), "r", encoding="utf-8") as f:
+            self.vocab = json.load(f)
+        self._tokens = _map_array(os.path.join(path, TOKENS_FILE), "I")
+        self._offsets = _map_array(os.path.join(path, OFFSETS_FILE), "Q")
+
+    def __len__(self) -> int:
+        return len(self.meta)
+
+    def token_ids(self, i: int) -> memoryview:
+        return self._tokens[self._offsets[i]:self._offsets[i + 1]]
+
+    def tokens(self, i: int) -> List[str]:
+        vocab = self.vocab
+        return [vocab[t] for t in self.token_ids(i)]
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        doc = dict(self.meta[i])
+        doc["tokens"] = self.tokens(i)
+        return doc
+
+
+def read_corpus(path: str):
+    """Open a processed corpus: a BinaryCorpus directory or a legacy JSON file."""
+    if os.path.isdir(path):
+        return BinaryCorpus(path)
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def convert_json(json_path: str) -> str:
+    """Convert a processed JSON corpus into a binary corpus next to it."""
+    with open(json_path, "r", encoding="utf-8") as f:
+        docs = json.load(f)
+    stem, _ = os.path.splitext(json_path)
+    return write_corpus(docs, stem + CORPUS_SUFFIX)
+
+
+def _size_on_disk(path: str) -> int:
+    return sum(os.path.getsize(p) for p in corpus_files(path))
+
+
+# ----------------------------
+# Main execution
+# ----------------------------
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python scripts/corpus_store.py ../data/processed/<name>.json [...]")
+        sys.exit(1)
+
+    for json_path in sys.argv[1:]:
+        out_path = convert_json(json_path)
+        print(f"✅ {json_path} ({_size_on_disk(json_path) / 1024:.0f} KB) -> "
+              f"{out_path} ({_size_on_disk(out_path) / 1024:.0f} KB)")
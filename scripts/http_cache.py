@@ -0,0 +1,169 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from typing import Dict, Any, Optional, Callable
+
+CACHE_DIR = os.path.join(os.path.dirname(__file__), "..", "data", "http_cache")
+MAX_CACHE_BYTES = 512 * 1024 * 1024
+VALIDATOR_HEADERS = ("ETag", "Last-Modified")
+KEPT_HEADERS = VALIDATOR_HEADERS + ("Content-Type", "Cache-Control", "Date")
+
+
+# ----------------------------
+# On-disk HTTP response cache
+# ----------------------------
+class HTTPCache:
+    """Disk cache of article pages, revalidated with conditional GETs.
+
+    Entries are addressed by the SHA-256 of the URL: ``<key>.json`` holds the
+    URL, kept headers, fetch time and the extracted text, ``<key>.body`` the
+    raw response body. A cached page is revalidated with If-None-Match /
+    If-Modified-Since, so an unchanged page costs a 304 and no re-parse.
+    Total size is capped; the least recently used entries (by file mtime,
+    refreshed on every hit) are evicted first.
+    """
+
+    def __init__(self, cache_dir: str = CACHE_DIR, max_bytes: int = MAX_CACHE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.evictions = 0
+
+    def _paths(self, url: str):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        base = os.path.join(self.cache_dir, key[:2], key)
+        return base + ".json", base + ".body"
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        meta_path, _ = self._paths(url)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return entry if entry.get("url") == url else None
+
+    def body(self, url: str) -> Optional[bytes]:
+        _, body_path = self._paths(url)
+        try:
+            with open(body_path, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def put(self, url: str, headers: Dict[str, str], body: bytes, text: str):
+        meta_path, body_path = self._paths(url)
+        os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+        entry = {
+            "url": url,
+            "headers": {h: headers[h] for h in KEPT_HEADERS if h in headers},
+            "fetched_at": time.time(),
+            "text": text,
+        }
+        old_size = _file_size(meta_path) + _file_size(body_path)
+        if body is not None:
+            _atomic_write(body_path, body)
+        _atomic_write(meta_path, json.dumps(entry, ensure_ascii=False).encode("utf-8"))
+        self._account(_file_size(meta_path) + _file_size(body_path) - old_size)
+
+    def fetch(self, url: str, session, timeout: float, extract: Callable[[str], str]) -> str:
+        """GET ``url`` through the cache and return its extracted text."""
+        entry = self.get(url)
+        headers = {}
+        if entry:
+            cached = entry.get("headers", {})
+            if "ETag" in cached:
+                headers["If-None-Match"] = cached["ETag"]
+            if "Last-Modified" in cached:
+                headers["If-Modified-Since"] = cached["Last-Modified"]
+
+        resp = session.get(url, headers=headers, timeout=timeout)
+        if resp.status_code == 304 and entry:
+            with self._lock:  # fetch runs on the whole fetch worker pool
+                self.hits += 1
+                self.revalidated += 1
+            entry["headers"].update({h: resp.headers[h] for h in VALIDATOR_HEADERS if h in resp.headers})
+            self.put(url, entry["headers"], None, entry["text"])
+            return entry["text"]
+
+        with self._lock:
+            self.misses += 1
+        text = extract(resp.text)
+        if resp.ok and any(h in resp.headers for h in VALIDATOR_HEADERS):
+            self.put(url, resp.headers, resp.content, text)
+        return text
+
+    # ----------------------------
+    # Size accounting + LRU eviction
+    # ----------------------------
+    def size(self) -> int:
+        with self._lock:
+            if self._size is None:
+                self._size = sum(_file_size(p) for p in self._entry_files())
+            return self._size
+
+    def _entry_files(self):
+        if not os.path.isdir(self.cache_dir):
+            return
+        for shard in os.scandir(self.cache_dir):
+            if shard.is_dir():
+                for f in os.scandir(shard.path):
+                    if f.name.endswith((".json", ".body")):
+                        yield f.path
+
+    def _account(self, delta: int):
+        if self.size() + delta > self.max_bytes:
+            self.evict()
+        else:
+            with self._lock:
+                self._size += delta
+
+    def evict(self, target_fraction: float = 0.9):
+        """Drop least recently used entries until the cache is under target_fraction of max_bytes."""
+        with self._lock:
+            entries = {}
+            for path in self._entry_files():
+                stem = os.path.splitext(path)[0]
+                st = os.stat(path)
+                mtime, size = entries.get(stem, (0.0, 0))
+                entries[stem] = (max(mtime, st.st_mtime), size + st.st_size)
+            total = sum(size for _, size in entries.values())
+            for stem, (_, size) in sorted(entries.items(), key=lambda item: item[1][0]):
+                if total <= self.max_bytes * target_fraction:
+                    break
+                for ext in (".json", ".body"):
+                    try:
+                        os.remove(stem + ext)
+                    except OSError:
+                        pass
+                total -= size
+                self.evictions += 1
+            self._size = total
+        logging.info(f"HTTP cache evicted down to {total / 1024 / 1024:.1f} MB")
+
+    def stats(self) -> Dict[str, Any]:
+        size = self.size()
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "revalidated": self.revalidated,
+                    "evictions": self.evictions, "bytes": size}
+
+
+def _file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _atomic_write(path: str, data: bytes):
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
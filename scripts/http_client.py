@@ -0,0 +1,73 @@
+import logging
+import threading
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import brotli  # noqa: F401  urllib3 decodes "br" bodies when brotli is installed
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    ACCEPT_ENCODING = "gzip, deflate"
+
+# ----------------------------
+# Pool configuration
+# ----------------------------
+POOL_CONNECTIONS = 32  # distinct hosts whose connection pools are kept alive
+POOL_MAXSIZE = 8       # keep-alive connections kept per host
+RETRIES = 2
+USER_AGENT = "TechTrendsNewsAgent/1.0 (+https://github.com/divyathoppae/Tech-Trends-News-Agent)"
+
+
+def create_session(pool_connections: int = POOL_CONNECTIONS, pool_maxsize: int = POOL_MAXSIZE,
+                   retries: int = RETRIES) -> requests.Session:
+    """Build a Session with per-host keep-alive pools and compressed transfers."""
+    session = requests.Session()
+    # Retry-After is ignored: a 429 can ask for hours, far past any fetch deadline,
+    # so retries use the short exponential backoff instead.
+    retry = Retry(total=retries, backoff_factor=0.3, status_forcelist=(429, 502, 503, 504),
+                  allowed_methods=("GET", "HEAD"), respect_retry_after_header=False)
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({
+        "User-Agent": USER_AGENT,
+        "Accept-Encoding": ACCEPT_ENCODING,
+        "Connection": "keep-alive",
+    })
+    return session
+
+
+# ----------------------------
+# Shared session
+# ----------------------------
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Process-wide Session shared by NewsAPI calls and article fetches.
+
+    The adapters' connection pools are thread-safe, so the fetch worker pool
+    shares one Session and reuses connections to the same publishers.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_session()
+                logging.info(f"Created shared HTTP session (pool_maxsize={POOL_MAXSIZE}, "
+                             f"Accept-Encoding: {ACCEPT_ENCODING})")
+    return _session
+
+
+def configure_session(**kwargs) -> requests.Session:
+    """Replace the shared session, e.g. to size pools for a larger fetch pool."""
+    global _session
+    with _session_lock:
+        old, _session = _session, create_session(**kwargs)
+    if old is not None:
+        old.close()
+    return _session
@@ -0,0 +1,215 @@
+import copy
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple, Optional, Generator
+
+from llm_interface import (HF_LLM, ModelHandle, StepGrammarProcessor, StepStoppingCriteria,
+                           _postprocess_to_two_lines)
+
+MAX_BATCH = 8
+BATCH_WINDOW = 0.02  # seconds to wait for more prompts after the first one arrives
+
+
+# ----------------------------
+# Batching scheduler
+# ----------------------------
+class _BatchStreamer:
+    """Streams each row of a batched generate into its request's chunk queue.
+
+    generate() only calls ``put`` and ``end``, so no transformers base class is needed.
+    """
+
+    def __init__(self, tokenizer, queues: List[Optional[queue.Queue]]):
+        self.tokenizer = tokenizer
+        self.queues = queues
+        self.tokens = [[] for _ in queues]
+        self.sent = [0] * len(queues)
+        self.prompt_seen = False
+
+    def put(self, value):
+        if not self.prompt_seen:  # generate() first passes the prompt ids
+            self.prompt_seen = True
+            return
+        for row, token in enumerate(value.reshape(-1).tolist()):
+            chunks = self.queues[row]
+            if chunks is None:
+                continue
+            self.tokens[row].append(token)
+            text = self.tokenizer.decode(self.tokens[row], skip_special_tokens=True)
+            if text.endswith("\ufffd"):  # wait for the rest of a multi-byte character
+                continue
+            if len(text) > self.sent[row]:
+                chunks.put(text[self.sent[row]:])
+                self.sent[row] = len(text)
+
+    def end(self):
+        for chunks in self.queues:
+            if chunks is not None:
+                chunks.put(None)
+
+
+@dataclass
+class _Request:
+    prompt: str
+    gen_cfg: object
+    constrained: bool
+    chunks: Optional[queue.Queue] = None  # streamed text chunks, then None
+    future: Future = field(default_factory=Future)
+
+    def key(self) -> Tuple:
+        # Only requests with identical generation settings can share a generate call.
+        return self.gen_cfg.to_json_string(), self.constrained
+
+
+class BatchScheduler:
+    """Runs prompts from concurrent callers through one batched ``generate``.
+
+    A worker thread takes the first pending prompt, waits up to ``window``
+    seconds for up to ``max_batch - 1`` more, left-pads them into one batch
+    and resolves each caller's Future with its own completion. Rows that hit
+    a stop condition early are finished (padded) while the rest continue.
+
+    Padding a batch reconfigures the Rust tokenizer, which fails with
+    "Already borrowed" if another thread is using it at the same time, so the
+    scheduler pads with its own copy rather than the shared ``handle.tokenizer``.
+    """
+
+    def __init__(self, handle: ModelHandle, max_batch: int = MAX_BATCH, window: float = BATCH_WINDOW):
+        self.handle = handle
+        self.tokenizer = copy.deepcopy(handle.tokenizer)
+        self.max_batch = max_batch
+        self.window = window
+        self._queue: "queue.Queue[_Request]" = queue.Queue()
+        self.batches = 0
+        self.requests = 0
+        self.generated_tokens = 0
+        self._thread = threading.Thread(target=self._loop, name="llm-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, prompt: str, gen_cfg, constrained: bool = False,
+               chunks: Optional[queue.Queue] = None) -> Future:
+        """Queue a prompt; if ``chunks`` is given, its text is streamed there as it's generated."""
+        request = _Request(prompt, gen_cfg, constrained, chunks)
+        self._queue.put(request)
+        return request.future
+
+    def _collect(self) -> List[_Request]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            groups: Dict[Tuple, List[_Request]] = {}
+            for request in self._collect():
+                groups.setdefault(request.key(), []).append(request)
+            for group in groups.values():
+                try:
+                    completions = self._generate(group)
+                except Exception as e:
+                    logging.exception("Batched generate failed")
+                    for request in group:
+                        request.future.set_exception(e)
+                        if request.chunks is not None:
+                            request.chunks.put(None)
+                    continue
+                for request, completion in zip(group, completions):
+                    request.future.set_result(completion)
+
+    def _generate(self, batch: List[_Request]) -> List[str]:
+        from transformers import LogitsProcessorList, StoppingCriteriaList
+        tokenizer = self.tokenizer
+        pad_token_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else tokenizer.eos_token_id
+        inputs = tokenizer([r.prompt for r in batch], return_tensors="pt", padding=True,
+                           padding_side="left").to(self.handle.model.device)
+        prompt_len = inputs["input_ids"].shape[1]
+        extra = {}
+        if any(r.chunks is not None for r in batch):
+            extra["streamer"] = _BatchStreamer(tokenizer, [r.chunks for r in batch])
+        if batch[0].constrained:
+            extra["logits_processor"] = LogitsProcessorList([
+                StepGrammarProcessor(self.handle.token_pieces(), prompt_len, tokenizer.eos_token_id)])
+        output = self.handle.generate(
+            **inputs, generation_config=batch[0].gen_cfg, pad_token_id=pad_token_id,
+            stopping_criteria=StoppingCriteriaList([StepStoppingCriteria(tokenizer, prompt_len)]), **extra)
+        new_tokens = output.sequences[:, prompt_len:]
+
+        self.batches += 1
+        self.requests += len(batch)
+        self.generated_tokens += int((new_tokens != pad_token_id).sum())
+        logging.info(f"Batched generate: {len(batch)} prompts, {new_tokens.shape[1]} steps")
+        return tokenizer.batch_decode(new_tokens, skip_special_tokens=True)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "avg_batch": self.requests / self.batches if self.batches else 0.0,
+            "generated_tokens": self.generated_tokens,
+        }
+
+
+_SCHEDULERS: Dict[Tuple, BatchScheduler] = {}
+_SCHEDULERS_LOCK = threading.Lock()
+
+
+def get_scheduler(handle: ModelHandle, max_batch: int = MAX_BATCH, window: float = BATCH_WINDOW) -> BatchScheduler:
+    """One scheduler per (loaded model, batch settings), shared by every BatchedLLM using it."""
+    key = (id(handle), max_batch, window)
+    with _SCHEDULERS_LOCK:
+        if key not in _SCHEDULERS:
+            _SCHEDULERS[key] = BatchScheduler(handle, max_batch, window)
+        return _SCHEDULERS[key]
+
+
+# ----------------------------
+# Drop-in LLM
+# ----------------------------
+class BatchedLLM(HF_LLM):
+    """HF_LLM whose calls are batched with other threads' calls to the same model.
+
+    Prefix KV-cache reuse is per sequence, so it is off for batched calls.
+    """
+
+    def __init__(self, *args, max_batch: int = MAX_BATCH, window: float = BATCH_WINDOW, **kwargs):
+        kwargs["prefix_cache"] = False
+        super().__init__(*args, **kwargs)
+        self.scheduler = get_scheduler(self.handle, max_batch, window)
+
+    def __call__(self, prompt: str) -> str:
+        full_prompt = prompt + "\n\n" + self.format_guard
+        completion = self._cached(full_prompt)
+        if completion is None:
+            completion = self.scheduler.submit(full_prompt, self.gen_cfg, self.constrained).result()
+            self._store(full_prompt, completion)
+        return _postprocess_to_two_lines(completion)
+
+    def stream(self, prompt: str) -> Generator[str, None, str]:
+        full_prompt = prompt + "\n\n" + self.format_guard
+        completion = self._cached(full_prompt)
+        if completion is not None:
+            yield completion
+            return _postprocess_to_two_lines(completion)
+
+        chunks: queue.Queue = queue.Queue()
+        future = self.scheduler.submit(full_prompt, self.gen_cfg, self.constrained, chunks)
+        while True:
+            chunk = chunks.get()
+            if chunk is None:
+                break
+            yield chunk
+        completion = future.result()
+        self._store(full_prompt, completion)
+        return _postprocess_to_two_lines(completion)
@@ -0,0 +1,141 @@
+import os
+import sys
+import json
+import atexit
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Dict, Any, Optional
+
+CACHE_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "llm_cache.sqlite")
+MAX_CACHE_BYTES = 64 * 1024 * 1024
+
+
+def completion_key(model: str, gen_config: Dict[str, Any], prompt: str) -> str:
+    """Stable key for one completion: hash of the model, its generation settings and the full prompt."""
+    payload = json.dumps({"model": model, "gen_config": gen_config, "prompt": prompt},
+                         sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# ----------------------------
+# Persistent completion cache
+# ----------------------------
+class CompletionCache:
+    """SQLite store of LLM completions for deterministic (greedy) generation.
+
+    Each row holds a completion and its size; ``last_used`` is refreshed on
+    every hit. When the stored completions exceed ``max_bytes``, the least
+    recently used rows are deleted until the cache is under 90% of it.
+    """
+
+    def __init__(self, path: str = CACHE_PATH, max_bytes: int = MAX_CACHE_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS completions ("
+            " key TEXT PRIMARY KEY, completion TEXT NOT NULL, size INTEGER NOT NULL,"
+            " created REAL NOT NULL, last_used REAL NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS completions_last_used ON completions(last_used)")
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT completion FROM completions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE completions SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, completion: str):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO completions (key, completion, size, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?)", (key, completion, len(completion.encode("utf-8")), now, now))
+            self._conn.commit()
+            if self._size() > self.max_bytes:
+                self._evict()
+
+    def _size(self) -> int:
+        return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()[0]
+
+    def _evict(self, target_fraction: float = 0.9):
+        total = self._size()
+        rows = self._conn.execute("SELECT key, size FROM completions ORDER BY last_used").fetchall()
+        evicted = []
+        for key, size in rows:
+            if total <= self.max_bytes * target_fraction:
+                break
+            evicted.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM completions WHERE key = ?", evicted)
+        self._conn.commit()
+        self.evictions += len(evicted)
+        logging.info(f"LLM cache evicted {len(evicted)} completions, now {total / 1024 / 1024:.1f} MB")
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM completions")
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM completions").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "bytes": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_cache: Optional[CompletionCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_completion_cache() -> CompletionCache:
+    """Process-wide completion cache at CACHE_PATH, opened on first use and closed at exit."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = CompletionCache()
+                atexit.register(_cache.close)
+    return _cache
+
+
+# ----------------------------
+# Main execution
+# ----------------------------
+if __name__ == "__main__":
+    if len(sys.argv) != 2 or sys.argv[1] not in ("stats", "clear"):
+        print("Usage: python scripts/llm_cache.py stats|clear")
+        sys.exit(1)
+
+    cache = CompletionCache()
+    if sys.argv[1] == "clear":
+        cache.clear()
+        print(f"✅ Cleared {cache.path}")
+    else:
+        print(cache.stats())
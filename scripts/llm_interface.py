@@ -1,10 +1,31 @@
+import os
 import re
-import torch
-from transformers import AutoModelForCausalLM, AutoTokenizer, GenerationConfig
+import copy
+import logging
+import threading
+from typing import TYPE_CHECKING, Dict, List, Tuple, Optional, Generator
+
+from llm_cache import completion_key
+from search_index import SCORERS
+
+# torch and transformers take seconds to import, so they are imported where a
+# model is loaded or run, not here: importing this module (and react_agent)
+# stays cheap until an HF_LLM is actually constructed.
+if TYPE_CHECKING:
+    import torch
 
 MODEL_NAME = "Qwen/Qwen2.5-0.5B-Instruct"
 LOAD_8BIT = False
-DTYPE = torch.bfloat16 if torch.cuda.is_available() else torch.float32
+DTYPE = None  # default_dtype(), resolved when the first model is loaded
+LLM_BACKENDS = ("torch", "int8", "onnx")
+BACKEND = "int8" if LOAD_8BIT else "torch"
+ONNX_CACHE_DIR = os.path.join(os.path.dirname(__file__), "..", "data", "onnx_models")
+
+
+def default_dtype():
+    import torch
+    return torch.bfloat16 if torch.cuda.is_available() else torch.float32
+
 
 T_PATTERN = re.compile(r"Thought:\s*(.+)")
 A_PATTERN = re.compile(r"Action:\s*(.+)")
@@ -33,28 +54,380 @@ def _postprocess_to_two_lines(text: str) -> str:
 
     return f"Thought: {thought}\nAction: {action}"
 
+# ----------------------------
+# Early stopping on the step format
+# ----------------------------
+def _action_complete(text: str) -> bool:
+    """True once the text holds an ``Action: name[...]`` whose brackets have closed.
+
+    Brackets inside double- or triple-quoted arguments don't count, so long
+    finish answers are not cut off.
+    """
+    start = text.rfind("Action:")
+    if start == -1:
+        return False
+    s = text[start:]
+    depth, quote, i = 0, None, 0
+    while i < len(s):
+        if quote:
+            if s[i] == "\\":
+                i += 2
+                continue
+            if s.startswith(quote, i):
+                i += len(quote)
+                quote = None
+                continue
+        elif s.startswith('"""', i):
+            quote = '"""'
+            i += 3
+            continue
+        elif s[i] == '"' and depth > 0:
+            quote = '"'
+        elif s[i] == "[":
+            depth += 1
+        elif s[i] == "]" and depth > 0:
+            depth -= 1
+            if depth == 0:
+                return True
+        i += 1
+    return False
+
+
+class StepStoppingCriteria:
+    """Stop generating once a complete Action line or an ``Observation:`` marker appears.
+
+    Each call decodes only the newest token of every sequence and appends it
+    to that sequence's text, so checking costs O(new tokens) per step. Like
+    StepGrammarProcessor it is a plain callable, which is all generate()
+    needs, rather than a transformers subclass.
+    """
+
+    def __init__(self, tokenizer, prompt_len: int):
+        self.tokenizer = tokenizer
+        self.prompt_len = prompt_len
+        self.texts = None
+        self.done = None
+
+    def __call__(self, input_ids: "torch.LongTensor", scores, **kwargs) -> "torch.BoolTensor":
+        import torch
+        if self.texts is None:
+            self.texts = [""] * input_ids.shape[0]
+            self.done = [False] * input_ids.shape[0]
+        if input_ids.shape[1] > self.prompt_len:
+            for row, token in enumerate(input_ids[:, -1].tolist()):
+                if self.done[row]:
+                    continue
+                piece = self.tokenizer.decode([token], skip_special_tokens=True)
+                text = self.texts[row] = self.texts[row] + piece
+                tail = text[-(len(piece) + len("Observation:")):]
+                self.done[row] = "Observation:" in tail or ("]" in piece and _action_complete(text))
+        return torch.tensor(self.done, dtype=torch.bool, device=input_ids.device)
+
+
+# ----------------------------
+# Grammar-constrained decoding
+# ----------------------------
+# Thought: <one line>
+# Action: search[query="<text>", k=<int>] | search[query="<text>", k=<int>, scorer="<SCORERS>"]
+#         | finish[answer="<text>"] | finish[answer="""<text>"""]
+#
+# A grammar state is a small tuple; _advance feeds it one character and
+# returns the next state, or None when the character can't extend a valid step.
+THOUGHT_MAX_CHARS = 300
+QUERY_MAX_CHARS = 120
+GRAMMAR_CANDIDATES = 32  # top-scoring tokens checked before scanning the whole vocabulary
+QUERY_FORBIDDEN = set('"[],\n')  # parse_action splits search args on ","
+TOOL_PREFIXES = {'search[query="': ("QUERY", 0), 'finish[answer="': ("ANSWER0",)}
+GRAMMAR_START = ("LIT", "Thought: ", 0, ("THOUGHT", 0, False))
+GRAMMAR_DONE = ("DONE",)
+
+
+def _advance(state, ch: str):
+    kind = state[0]
+    if kind == "LIT":
+        _, literal, pos, then = state
+        if ch != literal[pos]:
+            return None
+        return then if pos + 1 == len(literal) else ("LIT", literal, pos + 1, then)
+    if kind == "THOUGHT":
+        # Every character counts toward the limit, but the line needs some non-space text.
+        _, n, has_text = state
+        if ch == "\n":
+            return ("LIT", "Action: ", 0, ("TOOL", "")) if has_text else None
+        if n >= THOUGHT_MAX_CHARS or (ch.isspace() and not has_text and n + 1 >= THOUGHT_MAX_CHARS):
+            return None  # the last free character must be text if there is none yet
+        return ("THOUGHT", n + 1, has_text or not ch.isspace())
+    if kind == "TOOL":
+        name = state[1] + ch
+        for prefix, then in TOOL_PREFIXES.items():
+            if prefix == name:
+                return then
+            if prefix.startswith(name):
+                return ("TOOL", name)
+        return None
+    if kind == "QUERY":
+        n = state[1]
+        if ch == '"':
+            return ("LIT", ", k=", 0, ("K", 0)) if n > 0 else None
+        if ch in QUERY_FORBIDDEN or n >= QUERY_MAX_CHARS:
+            return None
+        return ("QUERY", n + 1)
+    if kind == "K":
+        n = state[1]
+        if ch.isdigit() and n < 2 and not (n == 0 and ch == "0"):
+            return ("K", n + 1)
+        if n > 0 and ch == ",":
+            return ("LIT", ' scorer="', 0, ("SCORER", ""))
+        return GRAMMAR_DONE if ch == "]" and n > 0 else None
+    if kind == "SCORER":
+        name = state[1]
+        if ch == '"':
+            return ("LIT", "]", 0, GRAMMAR_DONE) if name in SCORERS else None
+        name += ch
+        return ("SCORER", name) if any(scorer.startswith(name) for scorer in SCORERS) else None
+    if kind == "ANSWER0":
+        if ch == '"':
+            return ("LIT", '"', 0, ("TRIPLE", 0, 0))
+        return None if ch == "\\" else ("ANSWER",)
+    if kind == "ANSWER":
+        if ch == '"':
+            return ("LIT", "]", 0, GRAMMAR_DONE)
+        return None if ch == "\\" else state
+    if kind == "TRIPLE":
+        _, n, quotes = state
+        if ch != '"':
+            return ("TRIPLE", n + 1, 0)
+        if quotes == 2:
+            return ("LIT", "]", 0, GRAMMAR_DONE) if n > 0 else None
+        return ("TRIPLE", n, quotes + 1)
+    return None
+
+
+def _advance_text(state, text: str):
+    for ch in text:
+        state = _advance(state, ch)
+        if state is None:
+            return None
+    return state
+
+
+class StepGrammarProcessor:
+    """Mask logits so every sequence follows the Thought/Action grammar above.
+
+    For each row, the top GRAMMAR_CANDIDATES tokens are checked against the
+    row's grammar state and the rest are masked; only when none of them fits
+    is the whole vocabulary scanned, best score first. EOS is allowed only
+    once the Action is complete.
+    """
+
+    def __init__(self, pieces: List[str], prompt_len: int, eos_token_id: Optional[int]):
+        self.pieces = pieces
+        self.prompt_len = prompt_len
+        self.eos_token_id = eos_token_id
+        self.states = None
+
+    def __call__(self, input_ids: "torch.LongTensor", scores: "torch.FloatTensor") -> "torch.FloatTensor":
+        import torch
+        if self.states is None:
+            self.states = [GRAMMAR_START] * input_ids.shape[0]
+        elif input_ids.shape[1] > self.prompt_len:
+            for row, token in enumerate(input_ids[:, -1].tolist()):
+                if self.states[row] not in (None, GRAMMAR_DONE):
+                    self.states[row] = _advance_text(self.states[row], self._piece(token))
+
+        mask = torch.full_like(scores, float("-inf"))
+        for row, state in enumerate(self.states):
+            if state is None:  # left the grammar (shouldn't happen); leave the row unconstrained
+                mask[row] = 0
+                continue
+            if state == GRAMMAR_DONE:
+                if self.eos_token_id is not None:
+                    mask[row, self.eos_token_id] = 0
+                continue
+            allowed = self._allowed(state, torch.topk(scores[row], GRAMMAR_CANDIDATES).indices.tolist())
+            if not allowed:
+                allowed = self._allowed(state, torch.argsort(scores[row], descending=True).tolist(), first=True)
+            mask[row, allowed] = 0
+        return scores + mask
+
+    def _piece(self, token: int) -> str:
+        return self.pieces[token] if token < len(self.pieces) else ""
+
+    def _allowed(self, state, candidates, first: bool = False) -> List[int]:
+        allowed = []
+        for token in candidates:
+            piece = self._piece(token)
+            if piece and _advance_text(state, piece) is not None:
+                allowed.append(token)
+                if first:
+                    break
+        return allowed
+
+
+# ----------------------------
+# Shared model registry
+# ----------------------------
+def _load_torch_model(model_name: str, dtype, backend: str):
+    import torch
+    from transformers import AutoModelForCausalLM
+    if backend == "int8":
+        # Dynamic int8 quantization of the Linear layers; runs on CPU with float32 activations.
+        model = AutoModelForCausalLM.from_pretrained(model_name, dtype=torch.float32, trust_remote_code=True)
+        model.eval()
+        return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    model = AutoModelForCausalLM.from_pretrained(
+        model_name,
+        device_map="auto" if torch.cuda.is_available() else None,
+        dtype=dtype,
+        trust_remote_code=True
+    )
+    model.eval()
+    return model
+
+
+def _load_onnx_model(model_name: str, cache_dir: str = ONNX_CACHE_DIR):
+    """ONNX Runtime model; exported once and loaded from ``cache_dir`` afterwards."""
+    try:
+        from optimum.onnxruntime import ORTModelForCausalLM
+    except ImportError as e:
+        raise ImportError("The onnx backend needs optimum's ONNX Runtime support: "
+                          "pip install optimum-onnx onnxruntime") from e
+    export_dir = os.path.join(cache_dir, model_name.strip("/").replace("/", "--"))
+    if os.path.exists(os.path.join(export_dir, "config.json")):
+        return ORTModelForCausalLM.from_pretrained(export_dir)
+    logging.info(f"Exporting {model_name} to ONNX in {export_dir}")
+    model = ORTModelForCausalLM.from_pretrained(model_name, export=True)
+    model.save_pretrained(export_dir)
+    return model
+
+
+class ModelHandle:
+    """One loaded tokenizer + model, shared by every HF_LLM with the same (model_name, dtype, backend).
+
+    ``generate`` is serialized with a per-model lock, so threads (e.g. several
+    Streamlit sessions) can share a single copy of the weights safely.
+    """
+
+    def __init__(self, model_name: str, dtype, backend: str = BACKEND):
+        if backend not in LLM_BACKENDS:
+            raise ValueError(f"Unknown LLM backend {backend!r}; expected one of {LLM_BACKENDS}")
+        self.model_name = model_name
+        self.dtype = dtype
+        self.backend = backend
+        self.lock = threading.Lock()
+        from transformers import AutoTokenizer
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name, trust_remote_code=True)
+        if backend == "onnx":
+            self.model = _load_onnx_model(model_name)
+        else:
+            self.model = _load_torch_model(model_name, dtype, backend)
+        # ONNX Runtime keeps its own past_key_values format, which can't be cropped and reused.
+        self.supports_prefix_cache = backend != "onnx"
+        self.warmed_up = False
+        self._prefixes: Dict[str, tuple] = {}
+        self._pieces: Optional[List[str]] = None
+
+    def generate(self, **kwargs):
+        import torch
+        with self.lock, torch.no_grad():
+            return self.model.generate(**kwargs)
+
+    def prefix_cache(self, text: str):
+        """(token ids, past_key_values) for a static prompt prefix, computed once per model."""
+        with self.lock:
+            if text not in self._prefixes:
+                import torch
+                ids = self.tokenizer(text, return_tensors="pt")["input_ids"].to(self.model.device)
+                with torch.no_grad():
+                    past = self.model(input_ids=ids, use_cache=True).past_key_values
+                self._prefixes[text] = (ids[0], past)
+                logging.info(f"Cached {ids.shape[1]}-token prompt prefix for {self.model_name}")
+            return self._prefixes[text]
+
+    def token_pieces(self) -> List[str]:
+        """Decoded text of every token id (special tokens as ""), for constrained decoding."""
+        if self._pieces is None:
+            ids = [[i] for i in range(len(self.tokenizer))]
+            self._pieces = self.tokenizer.batch_decode(ids, skip_special_tokens=True)
+        return self._pieces
+
+    def prefixes(self):
+        with self.lock:
+            return list(self._prefixes.values())
+
+    def warmup(self, prompt: str = "Thought:", max_new_tokens: int = 4):
+        """Run one short generation so first-request latency excludes lazy init work."""
+        inputs = self.tokenizer(prompt, return_tensors="pt").to(self.model.device)
+        self.generate(**inputs, max_new_tokens=max_new_tokens, do_sample=False)
+        self.warmed_up = True
+        logging.info(f"Warmed up {self.model_name}")
+
+
+_MODELS: Dict[Tuple[str, str, str], ModelHandle] = {}
+_MODELS_LOCK = threading.Lock()
+
+
+def get_model(model_name: str = MODEL_NAME, dtype=DTYPE, backend: str = BACKEND) -> ModelHandle:
+    """Load (model_name, dtype, backend) once per process and return the shared handle."""
+    if dtype is None:
+        dtype = default_dtype()
+    key = (model_name, str(dtype), backend)
+    with _MODELS_LOCK:
+        if key not in _MODELS:
+            logging.info(f"Loading {model_name} ({dtype}, {backend} backend)")
+            _MODELS[key] = ModelHandle(model_name, dtype, backend)
+        return _MODELS[key]
+
+
+def warmup_model(model_name: str = MODEL_NAME, dtype=DTYPE, backend: str = BACKEND) -> ModelHandle:
+    handle = get_model(model_name, dtype, backend)
+    if not handle.warmed_up:
+        handle.warmup()
+    return handle
+
+
+def _common_prefix_len(a: "torch.Tensor", b: "torch.Tensor") -> int:
+    n = min(len(a), len(b))
+    mismatch = (a[:n] != b[:n]).nonzero()
+    return int(mismatch[0]) if len(mismatch) else n
+
+
 class HF_LLM:
     def __init__(self, model_name=MODEL_NAME, load_8bit=LOAD_8BIT,
-                 dtype=DTYPE, max_new_tokens=160, generation_kwargs=None):
+                 dtype=DTYPE, max_new_tokens=160, generation_kwargs=None, prefix_cache=True,
+                 constrained=False, backend=None, deterministic=False, cache=None):
         self.model_name = model_name
         self.load_8bit = load_8bit
         self.dtype = dtype
         self.max_new_tokens = max_new_tokens
         self.generation_kwargs = generation_kwargs or {}
+        self.backend = backend or ("int8" if load_8bit else BACKEND)
+        self.constrained = constrained
+        self.deterministic = deterministic
+        self._last: Optional[tuple] = None  # (token ids, past_key_values) of the previous call
+        self.cache_stats = {"reused_tokens": 0, "prefilled_tokens": 0}
 
-        self.tokenizer = AutoTokenizer.from_pretrained(self.model_name, trust_remote_code=True)
-        self.model = AutoModelForCausalLM.from_pretrained(
-            self.model_name,
-            device_map="auto" if torch.cuda.is_available() else None,
-            dtype=self.dtype,
-            trust_remote_code=True
-        )
+        # Weights come from the process-wide registry; constructing an HF_LLM is cheap.
+        self.handle = get_model(self.model_name, self.dtype, self.backend)
+        self.dtype = self.handle.dtype
+        self.tokenizer = self.handle.tokenizer
+        self.model = self.handle.model
+        self.prefix_cache = prefix_cache and self.handle.supports_prefix_cache
 
-        self.gen_cfg = GenerationConfig(
-            max_new_tokens=self.max_new_tokens,
-            temperature=self.generation_kwargs.get("temperature", 0.3),
-            do_sample=self.generation_kwargs.get("do_sample", True)
-        )
+        from transformers import GenerationConfig
+        if self.deterministic:
+            # Greedy decoding: the same prompt always gives the same completion.
+            self.gen_cfg = GenerationConfig(max_new_tokens=self.max_new_tokens, do_sample=False,
+                                            return_dict_in_generate=True)
+        else:
+            self.gen_cfg = GenerationConfig(
+                max_new_tokens=self.max_new_tokens,
+                temperature=self.generation_kwargs.get("temperature", 0.3),
+                do_sample=self.generation_kwargs.get("do_sample", True),
+                return_dict_in_generate=True
+            )
+        # Sampled completions aren't reproducible, so only greedy ones are cached.
+        self.cache = cache if not self.gen_cfg.do_sample else None
 
         self.format_guard = (
             "You are a helpful ReAct agent. Respond with EXACTLY two lines:\n"
@@ -63,16 +436,120 @@ class HF_LLM:
             "Do NOT combine search and finish in the same line.\n"
         )
 
+    def _generate(self, full_prompt: str, streamer=None) -> str:
+        from transformers import StoppingCriteriaList, LogitsProcessorList
+        inputs = self.tokenizer(full_prompt, return_tensors="pt").to(self.model.device)
+        extra = {}
+        if self.prefix_cache:
+            past = self._reusable_cache(inputs["input_ids"][0])
+            if past is not None:
+                extra["past_key_values"] = past
+        prompt_len = inputs["input_ids"].shape[1]
+        stopping = StoppingCriteriaList([StepStoppingCriteria(self.tokenizer, prompt_len)])
+        if self.constrained:
+            extra["logits_processor"] = LogitsProcessorList([
+                StepGrammarProcessor(self.handle.token_pieces(), prompt_len, self.tokenizer.eos_token_id)])
+        output = self.handle.generate(**inputs, generation_config=self.gen_cfg,
+                                      stopping_criteria=stopping, streamer=streamer, **extra)
+        output_ids = output.sequences
+        if self.prefix_cache:
+            past = output.past_key_values
+            self._last = (output_ids[0][:past.get_seq_length()], past)
+        return self.tokenizer.decode(output_ids[0][prompt_len:], skip_special_tokens=True)
+
+    def _cache_key(self, full_prompt: str) -> str:
+        config = {"gen": self.gen_cfg.to_diff_dict(), "dtype": str(self.dtype),
+                  "backend": self.backend, "constrained": self.constrained}
+        return completion_key(self.model_name, config, full_prompt)
+
+    def _cached(self, full_prompt: str) -> Optional[str]:
+        return self.cache.get(self._cache_key(full_prompt)) if self.cache is not None else None
+
+    def _store(self, full_prompt: str, completion: str):
+        if self.cache is not None:
+            self.cache.put(self._cache_key(full_prompt), completion)
+
     def __call__(self, prompt: str) -> str:
         full_prompt = prompt + "\n\n" + self.format_guard
-        inputs = self.tokenizer(full_prompt, return_tensors="pt").to(self.model.device)
-        with torch.no_grad():
-            output_ids = self.model.generate(**inputs, generation_config=self.gen_cfg)
-        completion = self.tokenizer.decode(output_ids[0][inputs["input_ids"].shape[1]:],
-                                           skip_special_tokens=True)
+        completion = self._cached(full_prompt)
+        if completion is None:
+            completion = self._generate(full_prompt)
+            self._store(full_prompt, completion)
         print(_postprocess_to_two_lines(completion))
         return _postprocess_to_two_lines(completion)
 
+    def stream(self, prompt: str) -> Generator[str, None, str]:
+        """Yield completion text as it is generated; the generator returns the two-line step.
+
+        Use ``step = yield from llm.stream(prompt)`` to forward chunks and get the result.
+        """
+        full_prompt = prompt + "\n\n" + self.format_guard
+        completion = self._cached(full_prompt)
+        if completion is not None:
+            yield completion
+            return _postprocess_to_two_lines(completion)
+
+        from transformers import TextIteratorStreamer
+        streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True)
+        result = {}
+
+        def worker():
+            try:
+                result["completion"] = self._generate(full_prompt, streamer)
+                self._store(full_prompt, result["completion"])
+            except Exception as e:
+                result["error"] = e
+                streamer.end()
+
+        thread = threading.Thread(target=worker, name="llm-stream", daemon=True)
+        thread.start()
+        for chunk in streamer:
+            if chunk:
+                yield chunk
+        thread.join()
+        if "error" in result:
+            raise result["error"]
+        return _postprocess_to_two_lines(result["completion"])
+
+    def warmup(self):
+        self.handle.warmup()
+
+    # ----------------------------
+    # Prefix KV-cache reuse
+    # ----------------------------
+    def cache_prefix(self, text: str):
+        """Precompute past_key_values for a prompt prefix every call starts with (e.g. the system preamble)."""
+        if self.prefix_cache:
+            self.handle.prefix_cache(text)
+
+    def reset_cache(self):
+        """Forget the previous call's cache, e.g. at the start of a new agent run."""
+        self._last = None
+
+    def _reusable_cache(self, input_ids: "torch.Tensor"):
+        """Copy of the cached past_key_values sharing the longest token prefix with input_ids.
+
+        Candidates are the static prefixes and the previous call of this run,
+        whose prompt is the current one minus the newest step. At least one
+        token is always left for generate to prefill.
+        """
+        best_len, best = 0, None
+        candidates = self.handle.prefixes() + ([self._last] if self._last else [])
+        for ids, past in candidates:
+            n = _common_prefix_len(ids, input_ids)
+            if n > best_len:
+                best_len, best = n, past
+        best_len = min(best_len, len(input_ids) - 1)
+        self.cache_stats["reused_tokens"] += best_len
+        self.cache_stats["prefilled_tokens"] += len(input_ids) - best_len
+        if best_len <= 0:
+            return None
+        # generate() extends the cache in place, so never hand out the stored one.
+        past = copy.deepcopy(best)
+        if past.get_seq_length() > best_len:
+            past.crop(best_len - past.get_seq_length())
+        return past
+
 if __name__ == "__main__":
     llm = HF_LLM()
     print(llm("Who painted The Starry Night?"))
@@ -0,0 +1,187 @@
+import os
+import re
+import time
+import logging
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import chain, islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+PREPROCESS_WORKERS = os.cpu_count() or 1
+PREPROCESS_CHUNK = 16  # documents per task sent to a worker
+LEMMA_CACHE_SIZE = 100_000  # distinct tokens remembered per process
+# Workers start from a clean interpreter instead of forking a parent that may
+# already run threads (e.g. the full-text fetch pool).
+START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+TOKEN_RE = re.compile(r"[a-zA-Z0-9]+")
+
+# (nltk.data path, package to download) for everything clean_text uses
+NLTK_RESOURCES = [
+    ("tokenizers/punkt_tab", "punkt_tab"),
+    ("corpora/stopwords", "stopwords"),
+    ("corpora/wordnet", "wordnet"),
+]
+
+# ----------------------------
+# NLTK resources (loaded once per process, on first use)
+# ----------------------------
+word_tokenize = None
+stop_words = None
+lemmatizer = None
+
+
+def ensure_nltk_data():
+    """Check that the NLTK data clean_text needs is installed, downloading only what is missing.
+
+    Installed data is found with ``nltk.data.find`` without touching the
+    network, so preprocessing works offline once the data is there.
+    """
+    import nltk
+    for path, package in NLTK_RESOURCES:
+        try:
+            nltk.data.find(path)
+        except LookupError:
+            logging.info(f"NLTK resource {package} not found, downloading it")
+            if not nltk.download(package, quiet=True):
+                raise LookupError(f"NLTK resource {package!r} is missing and could not be downloaded; "
+                                  f"install it with: python -m nltk.downloader {package}")
+
+
+def init_worker():
+    """Import NLTK and load the tokenizer, stopword set and lemmatizer for this process, if not loaded yet."""
+    global word_tokenize, stop_words, lemmatizer
+    if lemmatizer is None:
+        ensure_nltk_data()
+        from nltk.tokenize import word_tokenize as tokenize
+        from nltk.corpus import stopwords
+        from nltk.stem import WordNetLemmatizer
+        word_tokenize = tokenize
+        stop_words = set(stopwords.words("english"))
+        wordnet = WordNetLemmatizer()
+        wordnet.lemmatize("warmup")  # WordNet loads lazily; pay for it here, not on the first document
+        lemmatizer = wordnet
+
+# ----------------------------
+# Lemma cache
+# ----------------------------
+# Hits and misses summed over every chunk preprocess_texts has run, workers included.
+LEMMA_STATS = {"hits": 0, "misses": 0}
+
+
+@lru_cache(maxsize=LEMMA_CACHE_SIZE)
+def lemmatize(token: str) -> str:
+    """WordNet lemma of ``token``, computed once per distinct token (bounded LRU)."""
+    return lemmatizer.lemmatize(token)
+
+
+def lemma_cache_stats() -> Dict[str, float]:
+    lookups = LEMMA_STATS["hits"] + LEMMA_STATS["misses"]
+    return {
+        "hits": LEMMA_STATS["hits"],
+        "misses": LEMMA_STATS["misses"],
+        "hit_rate": LEMMA_STATS["hits"] / lookups if lookups else 0.0,
+        "cached": lemmatize.cache_info().currsize,
+    }
+
+# ----------------------------
+# Tokenize helper
+# ----------------------------
+def _filter_tokens(text: str) -> List[str]:
+    if lemmatizer is None:
+        init_worker()
+    tokens = word_tokenize(text.lower())
+    tokens = [t for t in tokens if TOKEN_RE.match(t)]
+    tokens = [t for t in tokens if t not in stop_words]
+    return tokens
+
+
+def clean_text(text: str):
+    return [lemmatize(t) for t in _filter_tokens(text)]
+
+
+def _clean_chunk(texts: List[str]) -> Tuple[List[List[str]], Dict[str, str], int, int]:
+    """Tokens for ``texts``, the token -> lemma pairs that differ, and this chunk's cache hits/misses."""
+    before = lemmatize.cache_info()
+    results = []
+    lemmas = {}
+    for text in texts:
+        raw = _filter_tokens(text)
+        tokens = [lemmatize(t) for t in raw]
+        lemmas.update((r, t) for r, t in zip(raw, tokens) if r != t)
+        results.append(tokens)
+    after = lemmatize.cache_info()
+    return results, lemmas, after.hits - before.hits, after.misses - before.misses
+
+
+def _chunks(texts: Iterable[str], size: int) -> Iterator[List[str]]:
+    chunk = []
+    for text in texts:
+        chunk.append(text)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+# ----------------------------
+# Parallel preprocessing
+# ----------------------------
+def preprocess_texts(texts: Iterable[str], workers: int = PREPROCESS_WORKERS,
+                     chunk_size: int = PREPROCESS_CHUNK,
+                     lemmas: Optional[Dict[str, str]] = None) -> Iterator[List[str]]:
+    """Yield ``clean_text`` tokens for each of ``texts``, in input order.
+
+    Documents go to a pool of ``workers`` processes in chunks of
+    ``chunk_size``; each worker loads NLTK resources once at startup. At most
+    two chunks per worker are in flight, so results stream back as soon as
+    the oldest chunk is done and long inputs are never all held in memory.
+    The pool never has more workers than chunks, and with ``workers <= 1``
+    or a single chunk everything runs in this process.
+
+    Lemmas go through a per-process LRU cache, so WordNet is consulted once
+    per distinct token rather than once per occurrence. Every token that
+    lemmatizes to something else is added to ``lemmas`` (if given), so the
+    caller can store it as the corpus's lemma table.
+    """
+    start = time.perf_counter()
+    n = hits = misses = 0
+    try:
+        for tokens, new_lemmas, chunk_hits, chunk_misses in _chunk_results(texts, workers, chunk_size):
+            n += len(tokens)
+            hits += chunk_hits
+            misses += chunk_misses
+            if lemmas is not None:
+                lemmas.update(new_lemmas)
+            yield from tokens
+    finally:  # also when the caller stops iterating early (e.g. zip() over a shorter list)
+        LEMMA_STATS["hits"] += hits
+        LEMMA_STATS["misses"] += misses
+        elapsed = time.perf_counter() - start
+        logging.info(f"Preprocessed {n} documents with {workers} workers in {elapsed:.2f}s, "
+                     f"lemma cache hit rate {hits / max(1, hits + misses):.1%} ({misses} distinct lookups)")
+
+
+def _chunk_results(texts: Iterable[str], workers: int, chunk_size: int) -> Iterator[Tuple]:
+    chunks = _chunks(texts, chunk_size)
+    # Look at up to ``workers`` chunks first: a short input (e.g. a few new
+    # articles in an incremental update) shouldn't start a pool of idle
+    # workers that each load WordNet.
+    head = list(islice(chunks, max(1, workers)))
+    workers = min(workers, len(head))
+    chunks = chain(head, chunks)
+    if workers <= 1:
+        for chunk in chunks:
+            yield _clean_chunk(chunk)
+        return
+    context = multiprocessing.get_context(START_METHOD)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=init_worker) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(_clean_chunk, chunk))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
@@ -1,12 +1,15 @@
 import re
 import json
-import os
 from dataclasses import dataclass, asdict
-from typing import List, Dict, Any, Tuple, Optional
-from datetime import datetime
+from typing import List, Dict, Any, Tuple, Optional, Iterator
 
-from llm_interface import HF_LLM
-from search_articles import load_processed, search_corpus
+from llm_interface import HF_LLM, BACKEND
+from llm_cache import get_completion_cache
+from run_log import get_run_log
+from search_articles import get_index, search_corpus
+from search_index import SCORERS
+
+PROMPT_TOKEN_BUDGET = 1500  # tokens for preamble + question + history; see make_prompt
 
 
 # ----------------------------
@@ -24,6 +27,12 @@ class AgentConfig:
     max_steps: int = 6
     allow_tools: Tuple[str, ...] = ("search", "finish")
     verbose: bool = True
+    scorer: str = "cosine"
+    backend: str = "postings"
+    llm_backend: str = BACKEND
+    deterministic: bool = False  # greedy decoding + persistent completion cache
+    prompt_budget: int = PROMPT_TOKEN_BUDGET
+    max_repeats: int = 2  # repeated tool calls tolerated per run before stopping early
 
 
 # ----------------------------
@@ -123,6 +132,39 @@ def parse_multiline_action(text: str) -> Optional[Tuple[str, Dict[str, Any]]]:
     return None
 
 
+SYSTEM_PREAMBLE = (
+    "You are a helpful ReAct agent. You may use tools to answer factual questions.\n\n"
+    "Available tools:\n"
+    "- search[query=\"<text>\", k=<int>] # searches the tech corpus\n"
+    "- finish[answer=\"<final answer>\"] # ends the task\n\n"
+    "Follow the exact step format:\n"
+    "Thought: <your reasoning>\n"
+    "Action: <one of the tool calls above>\n\n"
+    "IMPORTANT:\n"
+    "- When you use finish[answer=...], provide a comprehensive, detailed answer.\n"
+    "- Your answer should be multiple sentences that fully address the user's question.\n"
+    "- Synthesize and explain the information you found, don't just list keywords.\n"
+    "- For longer answers, you can use: finish[answer=\"\"\"your detailed multi-sentence answer here\"\"\"]\n"
+    "- You MUST call finish[] once you have enough information to answer.\n"
+    "- Do not search more than 2-3 times before finishing.\n"
+)
+
+
+def partial_answer(text: str) -> Optional[str]:
+    """Answer text of a finish[answer=...] action that may still be being generated."""
+    m = re.search(r'Action:\s*finish\s*\[\s*answer\s*=\s*("""|"|\')?', text)
+    if not m:
+        return None
+    # Hold back trailing quote/bracket characters: they may be the closing delimiter.
+    return text[m.end():].split("\nObservation:")[0].rstrip("\"']")
+
+
+def normalize_action(name: str, args: Dict[str, Any]) -> Tuple:
+    """Key identifying a tool call regardless of case, spacing and argument order."""
+    return (name,) + tuple(sorted((key.strip().lower(), " ".join(str(val).lower().split()))
+                                  for key, val in args.items()))
+
+
 def format_history(trajectory: List[Step]) -> str:
     lines = []
     for step in trajectory:
@@ -132,29 +174,118 @@ def format_history(trajectory: List[Step]) -> str:
     return "\n".join(lines)
 
 
-def make_prompt(user_query: str, trajectory: List[Step]) -> str:
-    SYSTEM_PREAMBLE = (
-        "You are a helpful ReAct agent. You may use tools to answer factual questions.\n\n"
-        "Available tools:\n"
-        "- search[query=\"<text>\", k=<int>] # searches the tech corpus\n"
-        "- finish[answer=\"<final answer>\"] # ends the task\n\n"
-        "Follow the exact step format:\n"
-        "Thought: <your reasoning>\n"
-        "Action: <one of the tool calls above>\n\n"
-        "IMPORTANT:\n"
-        "- When you use finish[answer=...], provide a comprehensive, detailed answer.\n"
-        "- Your answer should be multiple sentences that fully address the user's question.\n"
-        "- Synthesize and explain the information you found, don't just list keywords.\n"
-        "- For longer answers, you can use: finish[answer=\"\"\"your detailed multi-sentence answer here\"\"\"]\n"
-        "- You MUST call finish[] once you have enough information to answer.\n"
-        "- Do not search more than 2-3 times before finishing.\n"
-    )
-    history_block = format_history(trajectory)
-    
-    if history_block:
-        return f"{SYSTEM_PREAMBLE}\n\nUser Question: {user_query}\n\n{history_block}\n\nNext step:"
+# ----------------------------
+# Token-budgeted prompt construction
+# ----------------------------
+KEEP_RECENT_STEPS = 2       # newest steps that are never summarized
+OBS_MAX_RESULTS = 5
+OBS_SNIPPET_WORDS = 25
+MIN_CUT_CHARS = 200         # truncation never cuts the question or the newest step below this
+
+
+def count_tokens(text: str, tokenizer=None) -> int:
+    """Prompt length in model tokens (about 4 characters per token without a tokenizer)."""
+    if tokenizer is None:
+        return len(text) // 4 + 1
+    return len(tokenizer(text, add_special_tokens=False)["input_ids"])
+
+
+def _results(observation: str) -> Optional[List[Dict[str, Any]]]:
+    try:
+        data = json.loads(observation)
+    except (ValueError, TypeError):
+        return None
+    return data.get("results") if isinstance(data, dict) else None
+
+
+def compact_observation(observation: str) -> str:
+    """Minified search results: top results only, rounded scores, shortened snippets."""
+    results = _results(observation)
+    if results is None:
+        return observation
+    compact = []
+    for r in results[:OBS_MAX_RESULTS]:
+        item = {key: r[key] for key in ("id", "title") if key in r}
+        if "score" in r:
+            item["score"] = round(r["score"], 3)
+        if r.get("snippet"):
+            item["snippet"] = " ".join(str(r["snippet"]).split()[:OBS_SNIPPET_WORDS])
+        compact.append(item)
+    return json.dumps({"results": compact}, separators=(",", ":"), ensure_ascii=False)
+
+
+def summarize_step(step: Step, number: int) -> str:
+    """One line standing in for an older step once the prompt is over budget."""
+    results = _results(step.observation)
+    if results is None:
+        outcome = " ".join(step.observation.split())[:80]
     else:
-        return f"{SYSTEM_PREAMBLE}\n\nUser Question: {user_query}\n\nBegin:"
+        names = ", ".join(str(r.get("title") or r.get("id")) for r in results[:3])
+        outcome = f"{len(results)} results ({names})" if results else "no results"
+    return f"Step {number}: {step.action} -> {outcome}"
+
+
+def _step_blocks(trajectory: List[Step]) -> List[str]:
+    blocks, seen = [], {}
+    for number, step in enumerate(trajectory, 1):
+        obs = compact_observation(step.observation)
+        if obs in seen:
+            obs = f"(same as the observation of step {seen[obs]})"
+        else:
+            seen[obs] = number
+        blocks.append(f"Thought: {step.thought}\nAction: {step.action}\nObservation: {obs}")
+    return blocks
+
+
+def make_prompt(user_query: str, trajectory: List[Step], tokenizer=None,
+                budget: int = PROMPT_TOKEN_BUDGET) -> str:
+    """Build the next-step prompt within ``budget`` tokens.
+
+    Observations are compacted and repeats replaced by a back-reference.
+    While over budget, older steps are summarized to one line (oldest
+    first, keeping the newest KEEP_RECENT_STEPS whole), then the oldest
+    summaries are dropped, then the newest step is cut, and finally the
+    question itself. Cuts stop at MIN_CUT_CHARS, so a tiny budget can still
+    be exceeded.
+    """
+    question = user_query
+    blocks = _step_blocks(trajectory)
+    omitted = 0
+
+    def build() -> str:
+        head = f"{SYSTEM_PREAMBLE}\n\nUser Question: {question}\n\n"
+        if not blocks:
+            return head + "Begin:"
+        kept = blocks[omitted:]
+        if omitted:
+            kept = [f"({omitted} earlier steps omitted)"] + kept
+        return head + "\n".join(kept) + "\n\nNext step:"
+
+    prompt = build()
+    for i in range(len(blocks) - KEEP_RECENT_STEPS):
+        if count_tokens(prompt, tokenizer) <= budget:
+            return prompt
+        blocks[i] = summarize_step(trajectory[i], i + 1)
+        prompt = build()
+
+    while count_tokens(prompt, tokenizer) > budget and omitted < len(blocks) - 1:
+        omitted += 1
+        prompt = build()
+
+    # Cut the newest step, then the question, each to no less than MIN_CUT_CHARS.
+    newest = blocks[-1] if blocks else ""
+    keep_step, keep_question = len(newest), len(user_query)
+    over = count_tokens(prompt, tokenizer) - budget
+    while over > 0 and (keep_step > MIN_CUT_CHARS or keep_question > MIN_CUT_CHARS):
+        if keep_step > MIN_CUT_CHARS:
+            keep_step = max(MIN_CUT_CHARS, keep_step - over * 4)
+            blocks[-1] = newest[:keep_step] + "…"
+        else:
+            keep_question = max(MIN_CUT_CHARS, keep_question - over * 4)
+            question = user_query[:keep_question] + "…"
+        prompt = build()
+        over = count_tokens(prompt, tokenizer) - budget
+    return prompt
 
 
 # ----------------------------
@@ -162,10 +293,13 @@ def make_prompt(user_query: str, trajectory: List[Step]) -> str:
 # ----------------------------
 class ReActAgent:
     def __init__(self, llm=None, config=None):
-        self.llm = llm or HF_LLM()
         self.config = config or AgentConfig()
+        self.llm = llm or HF_LLM(backend=self.config.llm_backend, deterministic=self.config.deterministic,
+                                 cache=get_completion_cache() if self.config.deterministic else None)
         self.trajectory: List[Step] = []
-        self.corpus = load_processed()
+        self.index = get_index(backend=self.config.backend)
+        if hasattr(self.llm, "cache_prefix"):
+            self.llm.cache_prefix(SYSTEM_PREAMBLE)
 
     def _parse_llm_output(self, out: str) -> Tuple[str, str]:
         """Parse LLM output to extract thought and action."""
@@ -236,12 +370,57 @@ class ReActAgent:
 
         return thought, action_line
 
+    def _refresh_index(self):
+        """Reload the index if a newer processed corpus has landed since startup."""
+        index = get_index(backend=self.config.backend)
+        if index is not self.index:
+            self.index = index
+            if self.config.verbose:
+                print(f"🔄 Reloaded search index: {self.index.source}")
+
     def run(self, user_query: str) -> Dict[str, Any]:
+        for event in self.run_stream(user_query, stream_tokens=False):
+            if event["type"] == "final":
+                return event["result"]
+
+    def _call_llm(self, prompt: str, stream_tokens: bool):
+        """LLM step as a generator: yields token/answer events, returns the two-line output."""
+        if not (stream_tokens and hasattr(self.llm, "stream")):
+            return self.llm(prompt)
+        text, answer = "", ""
+        chunks = self.llm.stream(prompt)
+        while True:
+            try:
+                chunk = next(chunks)
+            except StopIteration as stop:
+                return stop.value
+            text += chunk
+            yield {"type": "token", "text": chunk}
+            partial = partial_answer(text)
+            if partial is not None and len(partial) > len(answer) and partial.startswith(answer):
+                yield {"type": "answer_token", "text": partial[len(answer):]}
+                answer = partial
+
+    def run_stream(self, user_query: str, stream_tokens: bool = True) -> Iterator[Dict[str, Any]]:
+        """Run the agent, yielding events as they happen.
+
+        Event types: ``step`` (a new LLM step starts), ``token`` (generated
+        text), ``answer_token`` (text of a finish answer being generated),
+        ``action`` (parsed thought + action), ``observation`` (tool result)
+        and finally ``final`` with the same result dict run() returns.
+        """
         self.trajectory.clear()
+        self._refresh_index()
+        if hasattr(self.llm, "reset_cache"):
+            self.llm.reset_cache()
+        tool_calls: Dict[Tuple, int] = {}  # normalized action -> step that first ran it
+        repeats = 0
         
         for step_idx in range(self.config.max_steps):
-            prompt = make_prompt(user_query, self.trajectory)
-            out = self.llm(prompt)
+            yield {"type": "step", "step": step_idx + 1}
+            prompt = make_prompt(user_query, self.trajectory, tokenizer=getattr(self.llm, "tokenizer", None),
+                                 budget=self.config.prompt_budget)
+            out = yield from self._call_llm(prompt, stream_tokens)
 
             if self.config.verbose:
                 print(f"\n{'='*50}")
@@ -255,27 +434,49 @@ class ReActAgent:
                 print(f"\nParsed Thought: {thought}")
                 print(f"Parsed Action: {action_line}")
 
+            yield {"type": "action", "thought": thought, "action": action_line}
             parsed = parse_action(action_line)
             if not parsed:
                 obs = "Invalid action format. Use: search[query=\"...\", k=3] or finish[answer=\"...\"]"
                 self.trajectory.append(Step(thought, action_line, obs))
                 if self.config.verbose:
                     print(f"Observation: {obs}")
+                yield {"type": "observation", "text": obs}
                 continue
 
             name, args = parsed
             obs = ""
 
+            key = normalize_action(name, args)
+            if name != "finish" and key in tool_calls:
+                repeats += 1
+                obs = (f"Repeated action: this exact call already ran in step {tool_calls[key]}; "
+                       f"its observation is above. Try a different search or call finish[answer=...].")
+                self.trajectory.append(Step(thought, action_line, obs))
+                if self.config.verbose:
+                    print(f"🔁 {obs}")
+                yield {"type": "observation", "text": obs, "repeated": True}
+                if repeats >= self.config.max_repeats:
+                    if self.config.verbose:
+                        print(f"\n⚠️ Stopping early after {repeats} repeated actions")
+                    break
+                continue
+            tool_calls[key] = step_idx + 1
+
             if name == "search":
                 query = args.get("query", "")
                 try:
                     k = int(args.get("k", 3))
                 except ValueError:
                     k = 3
-                results = search_corpus(query, self.corpus, k=k)
+                scorer = args.get("scorer", self.config.scorer)
+                if scorer not in SCORERS:
+                    scorer = self.config.scorer
+                results = search_corpus(query, self.index, k=k, scorer=scorer)
                 obs = json.dumps({"results": results}, indent=2)
+                yield {"type": "observation", "text": obs, "query": query, "results": results}
                 if self.config.verbose:
-                    print(f"🔍 Search query: '{query}', k={k}")
+                    print(f"🔍 Search query: '{query}', k={k}, scorer={scorer}")
                     print(f"Observation: {obs[:500]}..." if len(obs) > 500 else f"Observation: {obs}")
                     
             elif name == "finish":
@@ -288,16 +489,18 @@ class ReActAgent:
                 if self.config.verbose:
                     print(f"✅ Finished!")
                     print(f"📝 Answer length: {len(final['answer'])} characters")
-                self.save_run(user_query, final)
-                return final
+                run_id = self.save_run(user_query, final)
+                yield {"type": "final", "result": final, "run_id": run_id}
+                return
             else:
                 obs = f"Unknown tool: {name}. Available tools: search, finish"
                 if self.config.verbose:
                     print(f"Observation: {obs}")
+                yield {"type": "observation", "text": obs}
 
             self.trajectory.append(Step(thought, action_line, obs))
 
-        if self.config.verbose:
+        if self.config.verbose and repeats < self.config.max_repeats:
             print(f"\n⚠️ Max steps ({self.config.max_steps}) reached without finish")
         
         final_answer = self._generate_fallback_answer(user_query)
@@ -305,8 +508,8 @@ class ReActAgent:
             "answer": final_answer,
             "trajectory": [asdict(s) for s in self.trajectory]
         }
-        self.save_run(user_query, final)
-        return final
+        run_id = self.save_run(user_query, final)
+        yield {"type": "final", "result": final, "run_id": run_id}
 
     def _generate_fallback_answer(self, user_query: str) -> str:
         """Generate a fallback answer if max steps reached."""
@@ -324,16 +527,13 @@ class ReActAgent:
             return f"Based on search results: {json.dumps(all_results[:3], indent=2)}"
         return "(max steps reached, no final answer)"
 
-    def save_run(self, user_query: str, result: Dict[str, Any]):
-        base_dir = os.path.join(os.path.dirname(__file__), "..", "data", "agent_runs")
-        os.makedirs(base_dir, exist_ok=True)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        out_path = os.path.join(base_dir, f"run_{timestamp}.json")
-        payload = {"query": user_query, "result": result}
-        with open(out_path, "w", encoding="utf-8") as f:
-            json.dump(payload, f, indent=2)
+    def save_run(self, user_query: str, result: Dict[str, Any]) -> str:
+        """Queue the run for the background run-log writer; returns the run id without waiting on disk."""
+        writer = get_run_log()
+        run_id = writer.write(user_query, result)
         if self.config.verbose:
-            print(f"💾 Agent run saved to {out_path}")
+            print(f"💾 Agent run {run_id} queued for {writer.runs_dir}")
+        return run_id
 
 
 # ----------------------------
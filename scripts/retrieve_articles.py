@@ -1,15 +1,23 @@
 import os
-import re
 import json
+import time
 import logging
+import argparse
 import requests
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime, timedelta
+from typing import List, Optional
+from urllib.parse import urlparse
 from dotenv import load_dotenv
 from bs4 import BeautifulSoup
-from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords
-from nltk.stem import WordNetLemmatizer
-import nltk
+
+from search_index import InvertedIndex, index_path_for
+from http_client import get_session, configure_session, POOL_MAXSIZE
+from http_cache import HTTPCache, MAX_CACHE_BYTES
+from corpus_store import (CORPUS_SUFFIX, write_corpus, append_corpus, convert_json, load_manifest,
+                          content_hash, latest_corpus_path, BinaryCorpus, read_corpus, write_lemmas)
+from preprocess_articles import clean_text, preprocess_texts, PREPROCESS_WORKERS
 
 # ----------------------------
 # Logging setup
@@ -20,16 +28,6 @@ logging.basicConfig(
     format="%(asctime)s - %(levelname)s - %(message)s"
 )
 
-# ----------------------------
-# Ensure NLTK resources
-# ----------------------------
-nltk.download("punkt")
-nltk.download("stopwords")
-nltk.download("wordnet")
-
-stop_words = set(stopwords.words("english"))
-lemmatizer = WordNetLemmatizer()
-
 # ----------------------------
 # Load API key
 # ----------------------------
@@ -37,13 +35,22 @@ load_dotenv()
 API_KEY = os.getenv("NEWS_API_KEY")
 
 BASE_URL = "https://newsapi.org/v2/everything"
+RAW_DIR = os.path.join("..", "data", "raw")
+PROCESSED_DIR = os.path.join("..", "data", "processed")
+WINDOW_DAYS = 30
+
+# Full-text fetch concurrency
+FETCH_WORKERS = 16
+FETCH_PER_HOST = 4
+FETCH_TIMEOUT = 10
+FETCH_DEADLINE = 300  # seconds for the whole batch
 
 # ----------------------------
 # Fetch one page of articles
 # ----------------------------
-def fetch_articles(query="technology", language="en", page_size=100, page=1):
+def fetch_articles(query="technology", language="en", page_size=100, page=1, days=WINDOW_DAYS):
     to_date = datetime.now().strftime("%Y-%m-%d")
-    from_date = (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d")
+    from_date = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
 
     params = {
         "q": query,
@@ -55,7 +62,7 @@ def fetch_articles(query="technology", language="en", page_size=100, page=1):
         "apiKey": API_KEY
     }
     try:
-        response = requests.get(BASE_URL, params=params, timeout=10)
+        response = get_session().get(BASE_URL, params=params, timeout=10)
         response.raise_for_status()
         data = response.json()
         if data.get("status") != "ok" or not data.get("articles"):
@@ -67,50 +74,108 @@ def fetch_articles(query="technology", language="en", page_size=100, page=1):
         logging.error(f"API request failed: {e}")
         return None
 
-# ----------------------------
-# Tokenize helper
-# ----------------------------
-def clean_text(text: str):
-    tokens = word_tokenize(text.lower())
-    tokens = [t for t in tokens if re.match(r"[a-zA-Z0-9]+", t)]
-    tokens = [t for t in tokens if t not in stop_words]
-    tokens = [lemmatizer.lemmatize(t) for t in tokens]
-    return tokens
-
 # ----------------------------
 # Fetch full article text
 # ----------------------------
-def fetch_article_text(url: str) -> str:
+def extract_article_text(html: str) -> str:
+    soup = BeautifulSoup(html, "html.parser")
+    paragraphs = soup.find_all("p")
+    return " ".join(p.get_text() for p in paragraphs)
+
+def fetch_article_text(url: str, timeout: float = FETCH_TIMEOUT, session=None,
+                       cache: Optional[HTTPCache] = None) -> str:
     try:
-        resp = requests.get(url, timeout=10)
-        soup = BeautifulSoup(resp.text, "html.parser")
-        paragraphs = soup.find_all("p")
-        return " ".join(p.get_text() for p in paragraphs)
+        session = session or get_session()
+        if cache is not None:
+            return cache.fetch(url, session, timeout, extract_article_text)
+        resp = session.get(url, timeout=timeout)
+        return extract_article_text(resp.text)
     except Exception as e:
         logging.warning(f"Failed to fetch {url}: {e}")
         return ""
 
+# ----------------------------
+# Fetch many articles concurrently
+# ----------------------------
+def fetch_article_texts(urls: List[Optional[str]], workers: int = FETCH_WORKERS,
+                        per_host: int = FETCH_PER_HOST, deadline: Optional[float] = FETCH_DEADLINE,
+                        timeout: float = FETCH_TIMEOUT, session=None,
+                        cache: Optional[HTTPCache] = None) -> List[str]:
+    """Fetch article texts with a bounded worker pool; results keep the order of ``urls``.
+
+    At most ``per_host`` requests run against one host at a time, and hosts are
+    served round-robin so one slow publisher cannot take every worker. Articles
+    still pending when ``deadline`` seconds have passed are returned as "".
+    ``session`` defaults to the shared keep-alive session from http_client;
+    with ``cache``, pages fetched before are revalidated instead of re-downloaded.
+    """
+    texts = [""] * len(urls)
+    queues = defaultdict(deque)
+    for idx, url in enumerate(urls):
+        if url:
+            queues[urlparse(url).netloc].append(idx)
+
+    start = time.monotonic()
+    pool = ThreadPoolExecutor(max_workers=workers)
+    active = {}
+    in_flight = Counter()
+
+    def schedule():
+        # Least-busy hosts first, so free workers spread across publishers.
+        for host in sorted(queues, key=lambda h: in_flight[h]):
+            queue = queues[host]
+            while queue and in_flight[host] < per_host and len(active) < workers:
+                idx = queue.popleft()
+                active[pool.submit(fetch_article_text, urls[idx], timeout, session, cache)] = (idx, host)
+                in_flight[host] += 1
+
+    try:
+        schedule()
+        while active:
+            remaining = None if deadline is None else deadline - (time.monotonic() - start)
+            if remaining is not None and remaining <= 0:
+                break
+            done, _ = wait(active, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                idx, host = active.pop(future)
+                in_flight[host] -= 1
+                texts[idx] = future.result()
+            schedule()
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    skipped = len(active) + sum(len(q) for q in queues.values())
+    if skipped:
+        logging.warning(f"Fetch deadline of {deadline}s hit, {skipped} articles left without text")
+    logging.info(f"Fetched {len(urls) - skipped} article texts in {time.monotonic() - start:.1f}s"
+                 + (f", cache: {cache.stats()}" if cache is not None else ""))
+    return texts
+
 # ----------------------------
 # Save raw + preprocessed
 # ----------------------------
-def save_articles(all_articles, query):
+def save_articles(all_articles, query, workers: int = FETCH_WORKERS,
+                  per_host: int = FETCH_PER_HOST, deadline: Optional[float] = FETCH_DEADLINE,
+                  cache: Optional[HTTPCache] = None, preprocess_workers: int = PREPROCESS_WORKERS):
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
 
-    os.makedirs("../data/raw", exist_ok=True)
-    os.makedirs("../data/processed", exist_ok=True)
+    os.makedirs(RAW_DIR, exist_ok=True)
+    os.makedirs(PROCESSED_DIR, exist_ok=True)
 
     # Save raw JSON
-    raw_path = os.path.join("..","data", "raw", f"{query}_{timestamp}.json")
+    raw_path = os.path.join(RAW_DIR, f"{query}_{timestamp}.json")
     with open(raw_path, "w", encoding="utf-8") as f:
         json.dump(all_articles, f, indent=2)
 
-    # Preprocess each article
+    # Fetch full texts concurrently, then preprocess them in worker processes (results keep their order)
+    texts = fetch_article_texts([art.get("url") for art in all_articles],
+                                workers=workers, per_host=per_host, deadline=deadline, cache=cache)
     processed = []
-    for idx, art in enumerate(all_articles, start=1):
+    lemmas = {}
+    cleaned = preprocess_texts(texts, workers=preprocess_workers, lemmas=lemmas)
+    for idx, (art, tokens) in enumerate(zip(all_articles, cleaned), start=1):
         url = art.get("url")
         title = art.get("title", f"Article {idx}")
-        text = fetch_article_text(url)
-        tokens = clean_text(text)
         processed.append({
             "id": f"article_{idx}",
             "url": url,
@@ -118,26 +183,138 @@ def save_articles(all_articles, query):
             "tokens": tokens
         })
 
-    # Save processed JSON
-    processed_path = os.path.join("..", "data", "processed", f"{query}_{timestamp}.json")
-    with open(processed_path, "w", encoding="utf-8") as f:
-        json.dump(processed, f, indent=2)
+    # Save processed corpus (memory-mapped binary format, see corpus_store.py)
+    processed_path = os.path.join(PROCESSED_DIR, f"{query}_{timestamp}{CORPUS_SUFFIX}")
+    write_corpus(processed, processed_path)
+    write_lemmas(processed_path, lemmas)
+
+    # Build the search index once, next to the corpus it was built from
+    InvertedIndex.build(processed, source=processed_path).save(index_path_for(processed_path))
 
     logging.info(f"Saved raw to {raw_path} and processed to {processed_path}")
     print(f"✅ Saved {len(processed)} processed articles to {processed_path}")
 
+# ----------------------------
+# Incremental update of an existing corpus
+# ----------------------------
+def new_articles(articles, manifest):
+    """Articles whose URL is neither in the manifest nor earlier in ``articles``."""
+    known = manifest["articles"]
+    seen = set()
+    fresh = []
+    for art in articles:
+        url = art.get("url")
+        if url and url not in known and url not in seen:
+            seen.add(url)
+            fresh.append(art)
+    return fresh
+
+def update_articles(all_articles, query, corpus_path: str, workers: int = FETCH_WORKERS,
+                    per_host: int = FETCH_PER_HOST, deadline: Optional[float] = FETCH_DEADLINE,
+                    cache: Optional[HTTPCache] = None, preprocess_workers: int = PREPROCESS_WORKERS):
+    """Fetch and preprocess only articles missing from ``corpus_path``, then append them.
+
+    Known URLs are skipped before any page is fetched, and re-published
+    content (same token hash under a new URL) is dropped after preprocessing.
+    Articles whose text could not be fetched are left out of the manifest so
+    the next run retries them.
+    """
+    manifest = load_manifest(corpus_path)
+    fresh = new_articles(all_articles, manifest)
+    if not fresh:
+        print(f"✅ No new articles for {corpus_path}")
+        return
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    os.makedirs(RAW_DIR, exist_ok=True)
+    raw_path = os.path.join(RAW_DIR, f"{query}_{timestamp}.json")
+    with open(raw_path, "w", encoding="utf-8") as f:
+        json.dump(fresh, f, indent=2)
+
+    index_path = index_path_for(corpus_path)
+    index = InvertedIndex.load(index_path) if os.path.exists(index_path) else None
+    if index is not None and not index.is_current(corpus_path):
+        index = None
+
+    texts = fetch_article_texts([art.get("url") for art in fresh],
+                                workers=workers, per_host=per_host, deadline=deadline, cache=cache)
+    known_hashes = {a["hash"] for a in manifest["articles"].values()}
+    n_docs = len(BinaryCorpus(corpus_path))
+    processed = []
+    lemmas = {}
+    for art, tokens in zip(fresh, preprocess_texts(texts, workers=preprocess_workers, lemmas=lemmas)):
+        if not tokens:
+            continue
+        h = content_hash(tokens)
+        if h in known_hashes:
+            logging.info(f"Skipping re-published article {art.get('url')}")
+            continue
+        known_hashes.add(h)
+        n_docs += 1
+        processed.append({
+            "id": f"article_{n_docs}",
+            "url": art.get("url"),
+            "title": art.get("title", f"Article {n_docs}"),
+            "tokens": tokens
+        })
+
+    if processed:
+        append_corpus(corpus_path, processed)
+        write_lemmas(corpus_path, lemmas)
+        if index is None:
+            index = InvertedIndex.build(read_corpus(corpus_path), source=corpus_path)
+        else:
+            index.add_documents(processed, source=corpus_path)
+        index.save(index_path)
+
+    logging.info(f"Saved raw delta to {raw_path}, appended {len(processed)} of {len(fresh)} new articles to {corpus_path}")
+    print(f"✅ Appended {len(processed)} new articles to {corpus_path} ({n_docs} total)")
+
+def incremental_window_days(manifest) -> int:
+    """Days of NewsAPI history to request: since the last update, plus a day of overlap."""
+    elapsed = (time.time() - manifest.get("updated_at", 0)) / 86400
+    return max(1, min(WINDOW_DAYS, int(elapsed) + 1))
+
 # ----------------------------
 # Main execution
 # ----------------------------
 if __name__ == "__main__":
-    query = "technology"
+    parser = argparse.ArgumentParser(description="Retrieve and preprocess tech news articles.")
+    parser.add_argument("--query", default="technology")
+    parser.add_argument("--workers", type=int, default=FETCH_WORKERS, help="concurrent full-text fetches")
+    parser.add_argument("--per-host", type=int, default=FETCH_PER_HOST, help="concurrent fetches per publisher host")
+    parser.add_argument("--deadline", type=float, default=FETCH_DEADLINE, help="seconds allowed for all full-text fetches")
+    parser.add_argument("--preprocess-workers", type=int, default=PREPROCESS_WORKERS,
+                        help="processes for tokenizing and lemmatizing (1 = in this process)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="append only articles missing from the latest corpus instead of writing a new one")
+    parser.add_argument("--no-cache", action="store_true", help="re-download every article page")
+    parser.add_argument("--cache-max-mb", type=int, default=MAX_CACHE_BYTES // (1024 * 1024), help="HTTP cache size limit")
+    args = parser.parse_args()
+    configure_session(pool_maxsize=max(POOL_MAXSIZE, args.per_host))
+    cache = None if args.no_cache else HTTPCache(max_bytes=args.cache_max_mb * 1024 * 1024)
+
+    query = args.query
+    corpus_path = latest_corpus_path(PROCESSED_DIR) if args.incremental and os.path.isdir(PROCESSED_DIR) else None
+    if corpus_path and not os.path.isdir(corpus_path):
+        corpus_path = convert_json(corpus_path)  # legacy JSON corpus: convert once, then append in place
+    manifest = load_manifest(corpus_path) if corpus_path else None
+    days = incremental_window_days(manifest) if manifest else WINDOW_DAYS
+
     all_articles = []
     for page in range(1, 4):  # up to 3 pages (~300 articles)
-        articles = fetch_articles(query, page=page)
-        if articles:
-            all_articles.extend(articles)
+        articles = fetch_articles(query, page=page, days=days)
+        if not articles:
+            continue
+        all_articles.extend(articles)
+        if manifest and not new_articles(articles, manifest):
+            break  # results are newest first: an all-known page means the rest are known too
 
-    if all_articles:
-        save_articles(all_articles, query)
+    if all_articles and corpus_path:
+        update_articles(all_articles, query, corpus_path, workers=args.workers, per_host=args.per_host,
+                        deadline=args.deadline, cache=cache, preprocess_workers=args.preprocess_workers)
+    elif all_articles:
+        save_articles(all_articles, query, workers=args.workers, per_host=args.per_host,
+                      deadline=args.deadline, cache=cache, preprocess_workers=args.preprocess_workers)
     else:
         print("⚠️ No articles retrieved.")
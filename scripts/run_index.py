@@ -0,0 +1,182 @@
+import os
+import sys
+import json
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+
+RUNS_DIR = os.path.join(os.path.dirname(__file__), "..", "data", "agent_runs")
+INDEX_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "run_index.sqlite")
+PAGE_SIZE = 50
+
+
+def _legacy_timestamp(name: str) -> str:
+    # run_%Y%m%d_%H%M%S.json -> ISO timestamp; unknown names sort first.
+    try:
+        return datetime.strptime(os.path.splitext(name)[0], "run_%Y%m%d_%H%M%S").isoformat(timespec="milliseconds")
+    except ValueError:
+        return ""
+
+
+# ----------------------------
+# SQLite run index
+# ----------------------------
+class RunIndex:
+    """Index of saved agent runs for the "Previous Chats" sidebar.
+
+    One row per run: id, timestamp, query, answer, and a pointer to the full
+    record (file name relative to ``runs_dir`` plus the byte offset of its
+    line for JSONL logs, -1 for legacy per-run JSON files). Listing is a
+    paginated query on the timestamp index; trajectories are read from the
+    pointed-to file only when asked for.
+    """
+
+    def __init__(self, path: str = INDEX_PATH, runs_dir: str = RUNS_DIR):
+        self.path = path
+        self.runs_dir = runs_dir
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS runs ("
+            " run_id TEXT PRIMARY KEY, timestamp TEXT NOT NULL, query TEXT NOT NULL, answer TEXT,"
+            " file TEXT NOT NULL, offset INTEGER NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS runs_timestamp ON runs(timestamp)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS files (file TEXT PRIMARY KEY, indexed_bytes INTEGER NOT NULL)")
+        self._conn.commit()
+
+    # ----------------------------
+    # Writing
+    # ----------------------------
+    def add(self, run: Dict[str, Any], file: str, offset: int = -1, commit: bool = True):
+        """Index one run stored in ``file`` (at ``offset`` for JSONL logs)."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO runs (run_id, timestamp, query, answer, file, offset) VALUES (?, ?, ?, ?, ?, ?)",
+                (run["run_id"], run.get("timestamp", ""), run.get("query", ""),
+                 run.get("result", {}).get("answer", ""), os.path.basename(file), offset))
+            if commit:
+                self._conn.commit()
+
+    def mark_indexed(self, file: str, size: int):
+        """Record that ``file`` is indexed up to ``size`` bytes."""
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO files (file, indexed_bytes) VALUES (?, ?)",
+                               (os.path.basename(file), size))
+            self._conn.commit()
+
+    def import_runs(self) -> int:
+        """Index runs in ``runs_dir`` not seen yet; returns how many were added.
+
+        Legacy JSON files are read once; JSONL logs are read from the last
+        indexed byte, so only runs appended since then are parsed.
+        """
+        if not os.path.isdir(self.runs_dir):
+            return 0
+        with self._lock:
+            done = dict(self._conn.execute("SELECT file, indexed_bytes FROM files").fetchall())
+        added = 0
+        for name in sorted(os.listdir(self.runs_dir)):
+            path = os.path.join(self.runs_dir, name)
+            size = os.path.getsize(path)
+            start = done.get(name, 0)
+            if start >= size and name in done:
+                continue
+            if name.endswith(".json"):
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        run = json.load(f)
+                except (OSError, ValueError):
+                    logging.warning(f"Skipping unreadable run file {path}")
+                    continue
+                run.setdefault("run_id", os.path.splitext(name)[0])
+                run.setdefault("timestamp", _legacy_timestamp(name))
+                self.add(run, name, -1, commit=False)
+                added += 1
+            elif name.endswith(".jsonl"):
+                with open(path, "rb") as f:
+                    f.seek(start)
+                    offset = start
+                    for line in f:
+                        if not line.endswith(b"\n"):
+                            break  # still being written; pick it up next time
+                        try:
+                            self.add(json.loads(line), name, offset, commit=False)
+                            added += 1
+                        except ValueError:
+                            pass
+                        offset += len(line)
+                    size = offset
+            else:
+                continue
+            self.mark_indexed(name, size)
+        if added:
+            logging.info(f"Run index: imported {added} runs from {self.runs_dir}")
+        return added
+
+    # ----------------------------
+    # Reading
+    # ----------------------------
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+
+    def page(self, page: int = 0, page_size: int = PAGE_SIZE) -> List[Dict[str, Any]]:
+        """One page of runs, newest first: run_id, timestamp, query and answer (no trajectory)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT run_id, timestamp, query, answer FROM runs ORDER BY timestamp DESC, rowid DESC "
+                "LIMIT ? OFFSET ?", (page_size, page * page_size)).fetchall()
+        return [{"run_id": r[0], "timestamp": r[1], "query": r[2], "answer": r[3]} for r in rows]
+
+    def load(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """Full stored run, trajectory included, read from its file."""
+        with self._lock:
+            row = self._conn.execute("SELECT file, offset FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        if row is None:
+            return None
+        file, offset = row
+        path = os.path.join(self.runs_dir, file)
+        with open(path, "rb") as f:
+            if offset < 0:
+                return json.load(f)
+            f.seek(offset)
+            return json.loads(f.readline())
+
+    def trajectory(self, run_id: str) -> List[Dict[str, Any]]:
+        run = self.load(run_id)
+        return run.get("result", {}).get("trajectory", []) if run else []
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_index: Optional[RunIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_run_index() -> RunIndex:
+    """Process-wide run index, created on first use."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = RunIndex()
+    return _index
+
+
+# ----------------------------
+# Main execution
+# ----------------------------
+if __name__ == "__main__":
+    index = get_run_index()
+    added = index.import_runs()
+    print(f"✅ Imported {added} runs; {index.count()} runs indexed in {index.path}")
+    if len(sys.argv) > 1 and sys.argv[1] == "--list":
+        for run in index.page():
+            print(f"{run['timestamp']}  {run['run_id'][:12]}  {run['query'][:60]}")
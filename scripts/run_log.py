@@ -0,0 +1,180 @@
+import os
+import json
+import time
+import uuid
+import queue
+import atexit
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Any, Iterator, Optional
+
+from run_index import RUNS_DIR, RunIndex, get_run_index
+
+MAX_FILE_BYTES = 16 * 1024 * 1024
+FSYNC_INTERVAL = 1.0  # seconds; writes in between share one fsync
+
+_STOP = object()
+
+
+# ----------------------------
+# Background run-log writer
+# ----------------------------
+class RunLogWriter:
+    """Appends agent runs to rotating JSONL files from a background thread.
+
+    ``write`` only enqueues the record and returns its run id, so callers
+    never wait on disk I/O. The writer thread drains whatever is queued,
+    appends one JSON line per run, and fsyncs at most every
+    ``fsync_interval`` seconds. Each writer starts its own file
+    (``runs_<time>_<pid>.jsonl``) and rolls over to a new one past
+    ``max_bytes``, so concurrent processes never share a file. Pending
+    records are flushed at interpreter exit. With an ``index``, every run is
+    also added to the RunIndex along with its file and byte offset.
+    """
+
+    def __init__(self, runs_dir: str = RUNS_DIR, max_bytes: int = MAX_FILE_BYTES,
+                 fsync_interval: float = FSYNC_INTERVAL, index: Optional[RunIndex] = None):
+        self.runs_dir = runs_dir
+        self.index = index
+        self.max_bytes = max_bytes
+        self.fsync_interval = fsync_interval
+        self._queue: "queue.Queue" = queue.Queue()
+        self._file = None
+        self.path: Optional[str] = None
+        self.written = 0
+        self.fsyncs = 0
+        self._thread = threading.Thread(target=self._loop, name="run-log-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def write(self, query: str, result: Dict[str, Any]) -> str:
+        """Queue one run for writing and return its id."""
+        run_id = uuid.uuid4().hex
+        self._queue.put({
+            "run_id": run_id,
+            "timestamp": datetime.now().isoformat(timespec="milliseconds"),
+            "query": query,
+            "result": result,
+        })
+        return run_id
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until every run queued so far is written and fsynced."""
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    def _open(self):
+        os.makedirs(self.runs_dir, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        self.path = os.path.join(self.runs_dir, f"runs_{stamp}_{os.getpid()}.jsonl")
+        self._file = open(self.path, "ab")
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.fsyncs += 1
+        if self.index is not None:
+            self.index.mark_indexed(self.path, self._file.tell())
+
+    def _loop(self):
+        dirty = False
+        last_sync = time.monotonic()
+        while True:
+            timeout = max(0.0, self.fsync_interval - (time.monotonic() - last_sync)) if dirty else None
+            try:
+                items = [self._queue.get(timeout=timeout)]
+            except queue.Empty:
+                items = []
+            while True:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            waiters, stop = [], False
+            for item in items:
+                if item is _STOP:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    try:
+                        self._append(item)
+                        dirty = True
+                    except (OSError, TypeError, ValueError):
+                        logging.exception(f"Could not write run {item.get('run_id')}")
+
+            if dirty and (stop or waiters or time.monotonic() - last_sync >= self.fsync_interval):
+                self._sync()
+                dirty = False
+                last_sync = time.monotonic()
+            for waiter in waiters:
+                waiter.set()
+            if stop:
+                if self._file is not None:
+                    self._file.close()
+                return
+
+    def _append(self, record: Dict[str, Any]):
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        if self._file is None or self._file.tell() + len(line) > self.max_bytes:
+            if self._file is not None:
+                self._sync()
+                self._file.close()
+            self._open()
+        offset = self._file.tell()
+        self._file.write(line)
+        self.written += 1
+        if self.index is not None:
+            try:
+                self.index.add(record, self.path, offset, commit=False)
+            except Exception:
+                logging.exception(f"Could not index run {record['run_id']}")
+
+
+_writer: Optional[RunLogWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_run_log() -> RunLogWriter:
+    """Process-wide run-log writer, started on first use."""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = RunLogWriter(index=get_run_index())
+    return _writer
+
+
+# ----------------------------
+# Reading runs back
+# ----------------------------
+def iter_runs(runs_dir: str = RUNS_DIR) -> Iterator[Dict[str, Any]]:
+    """Every saved run, oldest file first: JSONL run logs and legacy ``run_*.json`` files."""
+    if not os.path.isdir(runs_dir):
+        return
+    for name in sorted(os.listdir(runs_dir)):
+        path = os.path.join(runs_dir, name)
+        if name.endswith(".json"):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    run = json.load(f)
+            except (OSError, ValueError):
+                logging.warning(f"Skipping unreadable run file {path}")
+                continue
+            run.setdefault("run_id", os.path.splitext(name)[0])
+            yield run
+        elif name.endswith(".jsonl"):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue  # torn last line of an interrupted write
@@ -1,11 +1,15 @@
 import os
 import re
 import math
-import json
 import logging
-import sys
+import argparse
+import threading
 from collections import defaultdict
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple, Union, Optional
+
+from search_index import InvertedIndex, index_path_for, corpus_fingerprint, SCORERS, BM25_K1, BM25_B, BM25_DELTA
+from search_cache import QueryCache
+from corpus_store import latest_corpus_path, read_corpus, load_lemmas
 
 # ----------------------------
 # Logging setup
@@ -19,8 +23,31 @@ logging.basicConfig(
 # ----------------------------
 # Tokenize helper
 # ----------------------------
-def tokenize(text: str) -> List[str]:
-    return re.findall(r"[a-zA-Z0-9']+", text.lower())
+def tokenize(text: str, lemmas: Optional[Dict[str, str]] = None) -> List[str]:
+    tokens = re.findall(r"[a-zA-Z0-9']+", text.lower())
+    if lemmas:
+        tokens = [lemmas.get(t, t) for t in tokens]
+    return tokens
+
+# ----------------------------
+# Query lemmatization
+# ----------------------------
+_lemma_table = (None, {})  # ((source, version), token -> lemma) of the last corpus searched
+
+def query_lemmas(index) -> Dict[str, str]:
+    """Token -> lemma table saved with the corpus ``index`` was built from.
+
+    Lets query terms match lemmatized corpus tokens without loading NLTK.
+    Reloaded when the corpus changes; empty for corpora saved without one.
+    """
+    global _lemma_table
+    source = getattr(index, "source", None)
+    if source is None:
+        return {}
+    key = (source, getattr(index, "version", None))
+    if _lemma_table[0] != key:
+        _lemma_table = (key, load_lemmas(source))
+    return _lemma_table[1]
 
 # ----------------------------
 # TF, DF, IDF
@@ -57,58 +84,125 @@ def cosine(a: Dict[str, float], b: Dict[str, float]) -> float:
 # ----------------------------
 # Load processed corpus
 # ----------------------------
-def load_processed(processed_dir="../data/processed") -> List[Dict[str, Any]]:
-    files = [f for f in os.listdir(processed_dir) if f.endswith(".json")]
-    if not files:
+def latest_processed_path(processed_dir="../data/processed") -> str:
+    latest = latest_corpus_path(processed_dir)
+    if latest is None:
         raise FileNotFoundError("No processed corpus found. Run preprocess_articles.py first.")
-    files.sort(reverse=True)
-    latest = os.path.join(processed_dir, files[0])
-    with open(latest, "r", encoding="utf-8") as f:
-        corpus = json.load(f)
+    return latest
+
+def load_processed(processed_dir="../data/processed"):
+    latest = latest_processed_path(processed_dir)
+    corpus = read_corpus(latest)
     logging.info(f"Loaded processed corpus: {latest} with {len(corpus)} docs")
-    return corpus  # corpus is a list of dicts
+    return corpus  # list of dicts, or a BinaryCorpus that decodes docs into the same dicts
+
+# ----------------------------
+# Load (or build) the inverted index
+# ----------------------------
+BACKENDS = ("postings", "sparse")
+
+def load_index(processed_dir="../data/processed", backend: str = "postings"):
+    """Load the index saved next to the newest corpus, rebuilding it if stale.
+
+    backend="sparse" wraps it in a NumPy/SciPy CSR matrix (see sparse_search.py).
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend: {backend}. Available backends: {', '.join(BACKENDS)}")
+    index = _load_inverted_index(processed_dir)
+    if backend == "sparse":
+        from sparse_search import SparseIndex
+        return SparseIndex(index)
+    return index
+
+def index_is_current(index, processed_dir="../data/processed") -> bool:
+    """False once a newer processed corpus has landed (or the indexed one changed)."""
+    latest = latest_processed_path(processed_dir)
+    return index.source == latest and index.fingerprint == corpus_fingerprint(latest)
+
+_INDEXES: Dict[Tuple[str, str], Any] = {}
+_INDEXES_LOCK = threading.Lock()
+
+def get_index(processed_dir="../data/processed", backend: str = "postings"):
+    """Process-wide loaded index for (processed_dir, backend), shared by every agent.
+
+    Loaded on first use and reloaded only once index_is_current() is false,
+    so a new request doesn't unpickle the postings (or rebuild the sparse
+    matrix) again.
+    """
+    key = (processed_dir, backend)
+    with _INDEXES_LOCK:
+        index = _INDEXES.get(key)
+        if index is None or not index_is_current(index, processed_dir):
+            index = _INDEXES[key] = load_index(processed_dir, backend)
+        return index
+
+def _load_inverted_index(processed_dir: str) -> InvertedIndex:
+    latest = latest_processed_path(processed_dir)
+    index_path = index_path_for(latest)
+    index = InvertedIndex.load(index_path) if os.path.exists(index_path) else None
+    if index is not None and index.is_current(latest):
+        logging.info(f"Loaded inverted index: {index_path} with {len(index)} docs")
+        return index
+
+    index = InvertedIndex.build(read_corpus(latest), source=latest)
+    index.save(index_path)
+    return index
 
 # ----------------------------
 # Search function
 # ----------------------------
-def search_corpus(query: str, corpus: List[Dict[str, Any]], k: int = 5):
-    docs = [{"id": d["id"], "tokens": d.get("tokens", [])} for d in corpus]
-    doc_tokens = [d["tokens"] for d in docs]
-    df = compute_df(doc_tokens)
-    n_docs = len(doc_tokens)
-    idf = {t: math.log((n_docs + 1) / (df[t] + 0.5)) + 1 for t in df}
-    doc_vecs = [tfidf_vector(d["tokens"], idf) for d in docs]
+QUERY_CACHE = QueryCache()
 
-    q_tokens = tokenize(query)
-    q_vec = tfidf_vector(q_tokens, idf)
+def search_corpus(query: str, corpus: Union[InvertedIndex, List[Dict[str, Any]]], k: int = 5,
+                  scorer: str = "cosine", k1: float = BM25_K1, b: float = BM25_B,
+                  delta: float = BM25_DELTA, cache: Optional[QueryCache] = QUERY_CACHE):
+    # Any loaded index (postings or sparse) works; a raw corpus still does too,
+    # but pays for a full index build on every call.
+    index = corpus if hasattr(corpus, "search") else InvertedIndex.build(corpus)
+    q_tokens = tokenize(query, query_lemmas(index))
 
-    scored = [(cosine(q_vec, v), i) for i, v in enumerate(doc_vecs)]
-    scored.sort(reverse=True)
+    # Scores only depend on query term counts, so word order is normalized away.
+    # Indexes built from an in-memory corpus have no version and are not cached.
+    version = getattr(index, "version", None)
+    use_cache = cache is not None and version is not None
+    key = (tuple(sorted(q_tokens)), k, scorer, k1, b, delta, type(index).__name__)
+    if use_cache:
+        cached = cache.get(key, version)
+        if cached is not None:
+            return cached
 
     results = []
-    for score, idx in scored[:k]:
+    for idx, score in index.search(q_tokens, k=k, scorer=scorer, k1=k1, b=b, delta=delta):
         results.append({
-            "id": docs[idx]["id"],
+            "id": index.doc_ids[idx],
             "score": score,
-            "snippet": " ".join(docs[idx]["tokens"][:30])  # preview first 30 tokens
+            "snippet": index.snippets[idx]  # preview first 30 tokens
         })
+    if use_cache:
+        cache.put(key, version, results)
     return results
 
 # ----------------------------
 # Main execution
 # ----------------------------
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python scripts/search_articles.py \"your query\" [top_k]")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Search the processed tech corpus.")
+    parser.add_argument("query", help="free-text query")
+    parser.add_argument("top_k", nargs="?", type=int, default=5, help="number of results (default: 5)")
+    parser.add_argument("--backend", choices=BACKENDS, default="postings", help="index backend (default: postings)")
+    parser.add_argument("--scorer", choices=SCORERS, default="cosine", help="ranking function (default: cosine)")
+    parser.add_argument("--k1", type=float, default=BM25_K1, help="BM25 term-frequency saturation")
+    parser.add_argument("--b", type=float, default=BM25_B, help="BM25 document-length normalization")
+    parser.add_argument("--delta", type=float, default=BM25_DELTA, help="BM25+ lower-bound shift")
+    args = parser.parse_args()
 
-    query = sys.argv[1]
-    k = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    query = args.query
+    k = args.top_k
 
-    corpus = load_processed()
-    results = search_corpus(query, corpus, k=k)
+    index = load_index(backend=args.backend)
+    results = search_corpus(query, index, k=k, scorer=args.scorer, k1=args.k1, b=args.b, delta=args.delta)
 
-    print(f"\nTop {k} results for query: {query}\n")
+    print(f"\nTop {k} results for query: {query} ({args.scorer})\n")
     for r in results:
         print(f"Doc: {r['id']} | Score: {r['score']:.4f}")
         print(f"Snippet: {r['snippet']}...\n")
@@ -0,0 +1,86 @@
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Tuple, Optional, Hashable
+
+DEFAULT_MAX_ENTRIES = 512
+DEFAULT_TTL_SECONDS = 15 * 60
+
+
+# ----------------------------
+# Query result cache
+# ----------------------------
+class QueryCache:
+    """Bounded LRU cache of search results with a per-entry TTL.
+
+    Keys are built by the caller from the normalized query and the search
+    parameters; ``version`` identifies the corpus the results came from.
+    When a lookup arrives for a new corpus version, every entry from the old
+    one is dropped.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl: float = DEFAULT_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+        self._version: Optional[str] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _check_version(self, version: Optional[str]):
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+                logging.info(f"Query cache invalidated: corpus {self._version} -> {version}")
+            self._entries.clear()
+            self._version = version
+
+    def get(self, key: Hashable, version: Optional[str]) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            stored_at, results = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return [dict(r) for r in results]
+
+    def put(self, key: Hashable, version: Optional[str], results: List[Dict[str, Any]]):
+        with self._lock:
+            self._check_version(version)
+            self._entries[key] = (time.monotonic(), [dict(r) for r in results])
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,279 @@
+import os
+import math
+import pickle
+import heapq
+import bisect
+import hashlib
+import logging
+from collections import Counter
+from typing import List, Dict, Any, Tuple, Optional
+
+from corpus_store import corpus_files
+
+# Bump whenever the on-disk layout of InvertedIndex changes so stale
+# sidecar files are rebuilt instead of unpickled into the wrong shape.
+INDEX_FORMAT = 3
+INDEX_SUFFIX = ".index.pkl"
+SNIPPET_TOKENS = 30
+
+SCORERS = ("cosine", "bm25", "bm25+")
+BM25_K1 = 1.2
+BM25_B = 0.75
+BM25_DELTA = 1.0
+
+
+# ----------------------------
+# Sidecar helpers
+# ----------------------------
+def index_path_for(corpus_path: str) -> str:
+    """Return the path of the index saved next to a processed corpus file."""
+    stem, _ = os.path.splitext(corpus_path)
+    return stem + INDEX_SUFFIX
+
+
+def corpus_fingerprint(corpus_path: str) -> Tuple[int, ...]:
+    fingerprint = ()
+    for path in corpus_files(corpus_path):
+        st = os.stat(path)
+        fingerprint += (st.st_size, st.st_mtime_ns)
+    return fingerprint
+
+
+def corpus_version(corpus_path: str) -> str:
+    h = hashlib.sha1()
+    for path in corpus_files(corpus_path):
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+    return h.hexdigest()[:12]
+
+
+# ----------------------------
+# Inverted index
+# ----------------------------
+class InvertedIndex:
+    """Inverted index over a processed corpus.
+
+    Postings map term -> (doc_ids, tfs, weights), sorted by doc id. ``tfs``
+    are raw term counts used by BM25; ``weights`` are the document's TF-IDF
+    components already divided by the document norm, so a cosine query only
+    walks the postings of its own terms.
+
+    ``term_bounds`` keeps (max weight, max tf, min doc length) per term; these
+    give per-term score upper bounds for MaxScore pruning under any scorer.
+    """
+
+    def __init__(self):
+        self.format = INDEX_FORMAT
+        self.doc_ids: List[str] = []
+        self.snippets: List[str] = []
+        self.doc_lens: List[int] = []
+        self.postings: Dict[str, Tuple[List[int], List[int], List[float]]] = {}
+        self.source: Optional[str] = None
+        self.fingerprint: Optional[Tuple[int, ...]] = None
+        self.version: Optional[str] = None
+        self._refresh_statistics()
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    @classmethod
+    def build(cls, corpus: List[Dict[str, Any]], source: Optional[str] = None) -> "InvertedIndex":
+        index = cls()
+        index.add_documents(corpus, source=source)
+        logging.info(f"Built inverted index: {len(index)} docs, {len(index.postings)} terms")
+        return index
+
+    def add_documents(self, docs: List[Dict[str, Any]], source: Optional[str] = None):
+        """Append documents, then refresh the corpus-wide statistics.
+
+        New documents take the next doc ids, so postings stay sorted. Existing
+        documents are not re-read: only the IDF-dependent weights, norms and
+        bounds are recomputed from the stored term counts.
+        """
+        for d in docs:
+            tokens = d.get("tokens", [])
+            i = len(self.doc_ids)
+            self.doc_ids.append(d["id"])
+            self.snippets.append(" ".join(tokens[:SNIPPET_TOKENS]))
+            self.doc_lens.append(len(tokens))
+            for t, c in Counter(tokens).items():
+                ids, tfs, _ = self.postings.setdefault(t, ([], [], []))
+                ids.append(i)
+                tfs.append(c)
+        self._refresh_statistics()
+
+        self.source = source
+        self.fingerprint = corpus_fingerprint(source) if source else None
+        self.version = corpus_version(source) if source else None
+
+    def _refresh_statistics(self):
+        n_docs = len(self.doc_ids)
+        doc_lens = self.doc_lens
+        self.idf = {t: math.log((n_docs + 1) / (len(ids) + 0.5)) + 1
+                    for t, (ids, _, _) in self.postings.items()}
+
+        squares = [0.0] * n_docs
+        for t, (ids, tfs, _) in self.postings.items():
+            idf = self.idf[t]
+            for i, tf in zip(ids, tfs):
+                v = tf / max(1, doc_lens[i]) * idf
+                squares[i] += v * v
+        self.doc_norms = [math.sqrt(sq) for sq in squares]
+
+        norms = self.doc_norms
+        for t, (ids, tfs, weights) in self.postings.items():
+            idf = self.idf[t]
+            weights[:] = [tf / max(1, doc_lens[i]) * idf / (norms[i] + 1e-12) for i, tf in zip(ids, tfs)]
+
+        self.avg_doc_len = sum(doc_lens) / max(1, n_docs)
+        self.term_bounds = {
+            t: (max(weights), max(tfs), min(doc_lens[i] for i in ids))
+            for t, (ids, tfs, weights) in self.postings.items()
+        }
+        self._bm25_impacts: Dict[Tuple[float, float, float], Dict[str, List[float]]] = {}
+
+    def is_current(self, corpus_path: str) -> bool:
+        """True if this index was built from the corpus file as it is on disk now."""
+        return (getattr(self, "format", None) == INDEX_FORMAT
+                and self.fingerprint == corpus_fingerprint(corpus_path))
+
+    def save(self, path: str):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        logging.info(f"Saved inverted index to {path}")
+
+    @staticmethod
+    def load(path: str) -> Optional["InvertedIndex"]:
+        try:
+            with open(path, "rb") as f:
+                index = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, AttributeError, EOFError) as e:
+            logging.warning(f"Could not load index {path}: {e}")
+            return None
+        return index if isinstance(index, InvertedIndex) else None
+
+    def search(self, q_tokens: List[str], k: int = 5, scorer: str = "cosine",
+               k1: float = BM25_K1, b: float = BM25_B, delta: float = BM25_DELTA,
+               prune: bool = True) -> List[Tuple[int, float]]:
+        """Score the query with the chosen scorer; returns (doc_idx, score), best first.
+
+        With ``prune`` the postings are traversed with MaxScore, so documents
+        that cannot reach the current top-k are never fully scored.
+        ``prune=False`` accumulates every matching document; both select the
+        top-k with a bounded heap instead of sorting all scores.
+        """
+        if scorer == "cosine":
+            terms = self._cosine_terms(q_tokens)
+        elif scorer in ("bm25", "bm25+"):
+            terms = self._bm25_terms(q_tokens, k1, b, delta if scorer == "bm25+" else 0.0)
+        else:
+            raise ValueError(f"Unknown scorer: {scorer}. Available scorers: {', '.join(SCORERS)}")
+        if k <= 0 or not terms:
+            return []
+
+        if prune:
+            top = _maxscore(terms, k)
+        else:
+            scores: Dict[int, float] = {}
+            for _, ids, impacts, qw in terms:
+                for i, v in zip(ids, impacts):
+                    scores[i] = scores.get(i, 0.0) + qw * v
+            top = heapq.nlargest(k, ((s, i) for i, s in scores.items()))
+        return [(i, s) for s, i in top]
+
+    # Each query term becomes (upper_bound, doc_ids, impacts, query_weight):
+    # the term's score in the j-th posting is query_weight * impacts[j].
+    def _cosine_terms(self, q_tokens: List[str]) -> List[Tuple[float, List[int], List[float], float]]:
+        counts = Counter(q_tokens)
+        length = max(1, len(q_tokens))
+        q_vec = {t: (c / length) * self.idf.get(t, 0.0) for t, c in counts.items()}
+        q_norm = math.sqrt(sum(v * v for v in q_vec.values()))
+        if q_norm == 0:
+            return []
+
+        terms = []
+        for t, qw in q_vec.items():
+            if qw == 0 or t not in self.postings:
+                continue
+            ids, _, weights = self.postings[t]
+            qw /= q_norm
+            terms.append((qw * self.term_bounds[t][0], ids, weights, qw))
+        return terms
+
+    def bm25_idf(self, term: str) -> float:
+        n_docs = len(self.doc_ids)
+        df = len(self.postings[term][0])
+        return math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+
+    def _bm25_terms(self, q_tokens: List[str], k1: float, b: float,
+                    delta: float) -> List[Tuple[float, List[int], List[float], float]]:
+        avg_len = self.avg_doc_len or 1.0
+        doc_lens = self.doc_lens
+
+        def saturate(tf, doc_len):
+            return tf * (k1 + 1) / (tf + k1 * (1 - b + b * doc_len / avg_len)) + delta
+
+        # Saturated tf values depend only on (k1, b, delta), so they are
+        # computed once per term and parameter set and reused across queries.
+        cache = self._bm25_impacts.setdefault((k1, b, delta), {})
+        terms = []
+        for t, qtf in Counter(q_tokens).items():
+            if t not in self.postings:
+                continue
+            ids, tfs, _ = self.postings[t]
+            if t not in cache:
+                cache[t] = [saturate(tf, doc_lens[i]) for i, tf in zip(ids, tfs)]
+            w = qtf * self.bm25_idf(t)
+            # Saturation grows with tf and shrinks with doc length, so the
+            # term's largest tf and shortest document bound every posting.
+            _, max_tf, min_len = self.term_bounds[t]
+            terms.append((w * saturate(max_tf, min_len), ids, cache[t], w))
+        return terms
+
+
+# ----------------------------
+# MaxScore top-k traversal
+# ----------------------------
+def _maxscore(terms: List[Tuple[float, List[int], List[float], float]], k: int) -> List[Tuple[float, int]]:
+    """Top-k with MaxScore pruning; returns (score, doc_idx), best first.
+
+    Terms are accumulated in order of decreasing upper bound. As soon as the
+    current k-th best partial score exceeds the summed bounds of the terms not
+    yet processed, no unseen document can reach the top-k: the remaining
+    (long, low-impact) postings are then only probed for the surviving
+    candidates, and candidates that can no longer beat the threshold are
+    dropped without being fully scored.
+    """
+    terms = sorted(terms, key=lambda term: term[0], reverse=True)
+    rest = [ub for ub, _, _, _ in terms] + [0.0]
+    for t in range(len(terms) - 1, -1, -1):
+        rest[t] += rest[t + 1]
+
+    acc: Dict[int, float] = {}
+    t = 0
+    while t < len(terms):
+        if len(acc) >= k and rest[t] < heapq.nlargest(k, acc.values())[-1]:
+            break
+        _, ids, impacts, qw = terms[t]
+        for i, v in zip(ids, impacts):
+            acc[i] = acc.get(i, 0.0) + qw * v
+        t += 1
+
+    for t in range(t, len(terms)):
+        threshold = heapq.nlargest(k, acc.values())[-1]
+        acc = {i: s for i, s in acc.items() if s + rest[t] >= threshold}
+        _, ids, impacts, qw = terms[t]
+        if len(acc) * max(1, len(ids).bit_length()) < len(ids):
+            for i in acc:
+                j = bisect.bisect_left(ids, i)
+                if j < len(ids) and ids[j] == i:
+                    acc[i] += qw * impacts[j]
+        else:
+            for i, v in zip(ids, impacts):
+                if i in acc:
+                    acc[i] += qw * v
+
+    return heapq.nlargest(k, ((s, i) for i, s in acc.items()))
@@ -0,0 +1,120 @@
+import math
+import logging
+from collections import Counter
+from typing import List, Dict, Tuple
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:  # optional backend; scipy ships with scikit-learn
+    np = None
+    sparse = None
+
+from search_index import InvertedIndex, BM25_K1, BM25_B, BM25_DELTA, SCORERS
+
+
+# ----------------------------
+# Sparse-matrix search backend
+# ----------------------------
+class SparseIndex:
+    """CSR document-term matrix view of an InvertedIndex.
+
+    Rows are documents, columns follow ``vocab``. The cosine matrix holds the
+    L2-normalized TF-IDF weights, so a query is one sparse mat-vec followed by
+    ``argpartition`` for the top-k. BM25 weight matrices are derived lazily per
+    (k1, b, delta) and cached.
+    """
+
+    def __init__(self, index: InvertedIndex):
+        if sparse is None:
+            raise ImportError("The sparse backend needs numpy and scipy: pip install scipy")
+        self.doc_ids = index.doc_ids
+        self.snippets = index.snippets
+        self.version = index.version
+        self.source = index.source
+        self.fingerprint = index.fingerprint
+        self.vocab = np.array(sorted(index.postings))
+        self.term_to_col = {t: j for j, t in enumerate(self.vocab)}
+        self.idf = np.array([index.idf[t] for t in self.vocab])
+        self.bm25_idf = np.array([index.bm25_idf(t) for t in self.vocab])
+        self.doc_lens = np.asarray(index.doc_lens, dtype=np.float64)
+        self.avg_doc_len = index.avg_doc_len or 1.0
+
+        rows, cols, tfs, weights = [], [], [], []
+        for t, (ids, t_tfs, t_weights) in index.postings.items():
+            j = self.term_to_col[t]
+            rows.extend(ids)
+            cols.extend([j] * len(ids))
+            tfs.extend(t_tfs)
+            weights.extend(t_weights)
+        shape = (len(self.doc_ids), len(self.vocab))
+        self.tf_matrix = sparse.csr_matrix((np.asarray(tfs, dtype=np.float64), (rows, cols)), shape=shape)
+        self.cosine_matrix = sparse.csr_matrix((np.asarray(weights, dtype=np.float64), (rows, cols)), shape=shape)
+        self._bm25_matrices: Dict[Tuple[float, float, float], "sparse.csr_matrix"] = {}
+        logging.info(f"Built sparse index: {shape[0]} docs x {shape[1]} terms, {self.tf_matrix.nnz} nnz")
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def _bm25_matrix(self, k1: float, b: float, delta: float):
+        key = (k1, b, delta)
+        if key not in self._bm25_matrices:
+            m = self.tf_matrix.tocoo()
+            norm = k1 * (1 - b + b * self.doc_lens[m.row] / self.avg_doc_len)
+            data = self.bm25_idf[m.col] * (m.data * (k1 + 1) / (m.data + norm) + delta)
+            self._bm25_matrices[key] = sparse.csr_matrix((data, (m.row, m.col)), shape=m.shape)
+        return self._bm25_matrices[key]
+
+    def query_matrix(self, queries: List[List[str]], scorer: str = "cosine"):
+        """Encode tokenized queries as a (n_queries x vocab) CSR matrix."""
+        rows, cols, data = [], [], []
+        for r, q_tokens in enumerate(queries):
+            counts = Counter(t for t in q_tokens if t in self.term_to_col)
+            length = max(1, len(q_tokens))
+            vec = {}
+            for t, c in counts.items():
+                j = self.term_to_col[t]
+                vec[j] = (c / length) * self.idf[j] if scorer == "cosine" else float(c)
+            if scorer == "cosine":
+                # Unknown terms still count towards the query norm, as in InvertedIndex.
+                norm = math.sqrt(sum(v * v for v in vec.values()))
+                vec = {j: v / norm for j, v in vec.items()} if norm else {}
+            for j, v in vec.items():
+                rows.append(r)
+                cols.append(j)
+                data.append(v)
+        return sparse.csr_matrix((data, (rows, cols)), shape=(len(queries), len(self.vocab)))
+
+    def score_matrix(self, q_matrix, scorer: str = "cosine", k1: float = BM25_K1,
+                     b: float = BM25_B, delta: float = BM25_DELTA):
+        """Score a batch of encoded queries in one multiply; returns a dense (n_docs x n_queries) array."""
+        if scorer == "cosine":
+            doc_matrix = self.cosine_matrix
+        elif scorer in ("bm25", "bm25+"):
+            doc_matrix = self._bm25_matrix(k1, b, delta if scorer == "bm25+" else 0.0)
+        else:
+            raise ValueError(f"Unknown scorer: {scorer}. Available scorers: {', '.join(SCORERS)}")
+        return (doc_matrix @ q_matrix.T).toarray()
+
+    def search_batch(self, queries: List[List[str]], k: int = 5, scorer: str = "cosine",
+                     k1: float = BM25_K1, b: float = BM25_B,
+                     delta: float = BM25_DELTA) -> List[List[Tuple[int, float]]]:
+        scores = self.score_matrix(self.query_matrix(queries, scorer), scorer, k1, b, delta)
+        return [top_k(scores[:, c], k) for c in range(scores.shape[1])]
+
+    def search(self, q_tokens: List[str], k: int = 5, scorer: str = "cosine",
+               k1: float = BM25_K1, b: float = BM25_B,
+               delta: float = BM25_DELTA) -> List[Tuple[int, float]]:
+        return self.search_batch([q_tokens], k, scorer, k1, b, delta)[0]
+
+
+def top_k(scores, k: int) -> List[Tuple[int, float]]:
+    """Top-k positive entries of a score vector via argpartition, best first."""
+    if k <= 0:
+        return []
+    candidates = np.flatnonzero(scores > 0)
+    if len(candidates) > k:
+        candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+    # Ties break towards the higher doc index, like the sorted (score, idx) path.
+    order = np.lexsort((-candidates, -scores[candidates]))
+    return [(int(i), float(scores[i])) for i in candidates[order]]
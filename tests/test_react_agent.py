@@ -0,0 +1,26 @@
+import os
+import sys
+import json
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+from react_agent import Step, make_prompt, count_tokens, MIN_CUT_CHARS
+
+
+def search_step(n_results: int = 5) -> Step:
+    results = [{"id": f"article_{i}", "score": 1.0, "snippet": "word " * 40} for i in range(n_results)]
+    return Step("I should search.", 'search[query="ai", k=5]', json.dumps({"results": results}))
+
+
+def test_long_question_is_cut_to_budget():
+    question = "What is new in AI chips? " * 220  # ~5.5k characters, over the whole budget on its own
+    prompt = make_prompt(question, [search_step()], budget=1500)
+    assert count_tokens(prompt) <= 1500
+    assert "…" in prompt
+
+
+def test_tiny_budget_returns():
+    # Nothing fits; the cuts stop at their minimum instead of looping forever.
+    prompt = make_prompt("x" * 1000, [search_step(), search_step()], budget=10)
+    assert "x" * MIN_CUT_CHARS in prompt and "x" * (MIN_CUT_CHARS + 1) not in prompt
+    assert prompt.endswith("Next step:")